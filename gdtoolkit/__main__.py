@@ -0,0 +1,310 @@
+"""GDScript toolkit
+
+Runs the linter, the formatting check and the complexity analysis at once,
+so that each file is read and parsed only once. Manages the cache shared
+by all the tools.
+
+Usage:
+  gdtoolkit check <path>... [options]
+  gdtoolkit cache (stats | clear)
+
+Options:
+  -l --line-length=<int>     How many characters per line to allow
+                             when checking formatting. [default: 100]
+  --max-complexity=<int>     Max cyclomatic complexity of a function
+                             or class. [default: 10]
+  -f --fast                  Skip formatting safety checks.
+  -j --jobs=<int>            How many files to check in parallel,
+                             0 means one per CPU. [default: 0]
+  --no-cache                 Don't use the cache of already checked files.
+  --gitignore                Skip files and directories ignored by .gitignore.
+  --project-scripts-first    Process autoload and main scene scripts first.
+  --trace=<file>             Write Chrome trace of the run to the file.
+  -v --verbose               Show extra prints
+  -h --help                  Show this screen.
+  --version                  Show version.
+
+Linter config is looked up the same way as by gdlint.
+"""
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from docopt import docopt
+
+from gdtoolkit.common.cache import ArtifactStore
+from gdtoolkit.common.tracing import (
+    add_events,
+    enable_tracing,
+    file_span,
+    is_tracing_enabled,
+    pop_events,
+    span,
+    start_collecting,
+)
+from gdtoolkit.common.utils import find_gd_files_from_paths
+from gdtoolkit.common.version import get_gdtoolkit_version
+from gdtoolkit.formatter.diff import get_opcodes
+from gdtoolkit.formatter.exceptions import (
+    TreeInvariantViolation,
+    FormattingStabilityViolation,
+    CommentPersistenceViolation,
+)
+from gdtoolkit.linter.config import load_config
+
+if TYPE_CHECKING:
+    from lark import Tree
+
+# The tools (and the parser) are imported by the functions using them,
+# so that --help doesn't have to load them.
+# pylint: disable=import-outside-toplevel
+
+# messages and trace events
+FileReport = Tuple[List[str], List[Dict[str, Any]]]
+
+
+@dataclass
+class CheckOptions:
+    line_length: int
+    max_complexity: int
+    safety_checks: bool
+    use_cache: bool
+    trace: bool
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    arguments = docopt(__doc__, version="gdtoolkit {}".format(get_gdtoolkit_version()))
+
+    if arguments["--verbose"]:
+        logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+    if arguments["cache"]:
+        _manage_cache(arguments)
+        return
+
+    enable_tracing(arguments["--trace"])
+
+    config = load_config()
+    options = CheckOptions(
+        line_length=int(arguments["--line-length"]),
+        max_complexity=int(arguments["--max-complexity"]),
+        safety_checks=not arguments["--fast"],
+        use_cache=not arguments["--no-cache"],
+        trace=is_tracing_enabled(),
+    )
+    files = find_gd_files_from_paths(
+        arguments["<path>"],
+        excluded_directories=frozenset(config["excluded_directories"]),
+        use_gitignore=arguments["--gitignore"],
+        project_scripts_first=arguments["--project-scripts-first"],
+    )
+    # config may be a read-only mapping which can't be sent to workers
+    check_file = partial(_check_file, config=dict(config), options=options)
+    jobs = int(arguments["--jobs"]) or os.cpu_count() or 1
+
+    problems_total = _check_files(files, check_file, jobs)
+
+    if problems_total > 0:
+        print(
+            "Failure: {} problem{} found".format(
+                problems_total, "" if problems_total == 1 else "s"
+            ),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    print("Success: no problems found")
+
+
+def _manage_cache(arguments: Dict[str, Any]) -> None:
+    store = _get_store()
+    if arguments["clear"]:
+        store.clear()
+        return
+    stats = store.stats()
+    print("Cache directory: {}".format(store.directory))
+    for kind, (entries, size_bytes) in sorted(stats.kinds.items()):
+        print("{}: {} entries, {:.2f} MiB".format(kind, entries, size_bytes / 2**20))
+    print(
+        "Total: {} entries, {:.2f} MiB of {:.2f} MiB allowed".format(
+            stats.entries, stats.size_bytes / 2**20, store.max_size_bytes / 2**20
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_store() -> ArtifactStore:
+    # a single store per process (including each of the workers)
+    return ArtifactStore()
+
+
+def _check_files(
+    files: Iterable[str], check_file: Callable[[str], FileReport], jobs: int
+) -> int:
+    if jobs == 1:
+        return _print_reports(map(check_file, files))
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return _print_reports(executor.map(check_file, files))
+
+
+def _print_reports(reports: Iterator[FileReport]) -> int:
+    # reports are printed in the order of files, each message is a problem
+    problems_total = 0
+    for messages, trace_events in reports:
+        for message in messages:
+            print(message, file=sys.stderr)
+        problems_total += len(messages)
+        add_events(trace_events)
+    return problems_total
+
+
+def _check_file(file_path: str, config: dict, options: CheckOptions) -> FileReport:
+    # trace events recorded by workers are sent back along with the messages
+    if options.trace:
+        start_collecting()
+    with file_span(file_path):
+        messages = _check_file_content(file_path, config, options)
+    if options.use_cache:
+        # workers live as long as the pool, so each file is saved separately;
+        # it's cheap unless something was written
+        _get_store().save()
+    return messages, pop_events()
+
+
+def _check_file_content(
+    file_path: str, config: dict, options: CheckOptions
+) -> List[str]:
+    import lark
+    from gdtoolkit.common.exceptions import lark_syntax_error_to_str
+    from gdtoolkit.linter import lint_code
+    from gdtoolkit.parser import parser
+
+    try:
+        with span("read"), open(file_path, "r", encoding="utf-8") as fh:
+            code = fh.read()
+    except OSError as e:
+        return ["Cannot open file '{}': {}".format(file_path, e.strerror)]
+    # only the files without problems are remembered, as messages contain paths
+    cache_options = (
+        json.dumps(dict(config), sort_keys=True, default=sorted),
+        options.line_length,
+        options.max_complexity,
+        options.safety_checks,
+    )
+    if options.use_cache and _get_store().get("check", code, cache_options):
+        return []
+    try:
+        parse_tree = parser.parse(code, gather_metadata=True)
+        comment_parse_tree = parser.parse_comments(code)
+    except lark.exceptions.UnexpectedInput as e:
+        # all syntax errors are reported at once, not only the first one
+        syntax_errors = parser.parse_with_error_recovery(code).errors or [e]
+        return [
+            "{}:\n\n{}".format(file_path, lark_syntax_error_to_str(error, code))
+            for error in syntax_errors
+        ]
+    messages = [
+        _problem_to_str(file_path, problem.line, problem.description, problem.name)
+        for problem in lint_code(code, MappingProxyType(config), parse_tree)
+    ]
+    messages += _check_formatting(
+        file_path, code, parse_tree, comment_parse_tree, options
+    )
+    messages += _check_complexity(file_path, code, parse_tree, options)
+    if options.use_cache and messages == []:
+        _get_store().put("check", code, True, cache_options)
+    return messages
+
+
+def _check_formatting(
+    file_path: str,
+    code: str,
+    parse_tree: "Tree",
+    comment_parse_tree: "Tree",
+    options: CheckOptions,
+) -> List[str]:
+    from gdtoolkit.formatter import format_code, check_formatting_safety
+
+    try:
+        formatted_code = format_code(
+            gdscript_code=code,
+            max_line_length=options.line_length,
+            parse_tree=parse_tree,
+            comment_parse_tree=comment_parse_tree,
+        )
+        if formatted_code == code:
+            return []
+        if options.safety_checks:
+            check_formatting_safety(
+                code,
+                formatted_code,
+                max_line_length=options.line_length,
+                given_code_parse_tree=parse_tree,
+                given_code_comment_parse_tree=comment_parse_tree,
+            )
+    except TreeInvariantViolation:
+        return [
+            "{}: Failed to format, formatted code parse tree differs".format(file_path)
+        ]
+    except FormattingStabilityViolation:
+        return ["{}: Failed to format, formatted code is unstable".format(file_path)]
+    except CommentPersistenceViolation:
+        return [
+            "{}: Failed to format, some comments are missing in formatted code".format(
+                file_path
+            )
+        ]
+    code_lines = code.splitlines()
+    first_changed_line = next(
+        (
+            i1 + 1
+            for tag, i1, _, _, _ in get_opcodes(code_lines, formatted_code.splitlines())
+            if tag != "equal"
+        ),
+        max(1, len(code_lines)),  # only the trailing newline differs
+    )
+    return [
+        _problem_to_str(
+            file_path, first_changed_line, "Code would be reformatted", "gdformat"
+        )
+    ]
+
+
+def _check_complexity(
+    file_path: str, code: str, parse_tree: "Tree", options: CheckOptions
+) -> List[str]:
+    from radon.complexity import cc_visit
+    from gdtoolkit.gd2py import convert_code
+
+    try:
+        with span("convert"):
+            python_code = convert_code(code, parse_tree)
+        with span("cc"):
+            results = cc_visit(python_code)
+    except Exception as e:  # pylint: disable=broad-except
+        return ["Cannot analyze complexity of '{}': {}".format(file_path, e)]
+    # line numbers refer to the code converted to python, so they are omitted
+    return [
+        "{}: Error: '{}' is too complex ({} > {}) (max-complexity)".format(
+            file_path, result.name, result.complexity, options.max_complexity
+        )
+        for result in results
+        if result.complexity > options.max_complexity
+    ]
+
+
+def _problem_to_str(file_path: str, line: int, description: str, name: str) -> str:
+    # the same format as used by gdlint
+    return "{}:{}: Error: {} ({})".format(file_path, line, description, name)
+
+
+if __name__ == "__main__":
+    main()
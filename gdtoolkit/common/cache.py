@@ -0,0 +1,179 @@
+"""
+Content-addressed store of artifacts computed by the tools (formatting
+outcomes, lint problems, check results, ...) shared by all of them.
+Each artifact is kept in a separate pickle file named after the hash of
+(source code hash, artifact kind, gdtoolkit version, options). Files are
+written atomically, so parallel workers can share the store safely, and their
+modification times are bumped on every hit, so that the least recently used
+ones are evicted once the store grows past its size cap. As walking the
+whole store is costly, its size is estimated in a separate file and the store
+is walked only when the estimate crosses the cap.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils import get_cache_directory
+from .version import get_gdtoolkit_version
+
+DEFAULT_MAX_SIZE_BYTES = 64 * 2**20
+# artifacts are tiny, but each of them takes at least a block on the disk
+BLOCK_SIZE_BYTES = 4096
+ARTIFACT_FILE_EXTENSION = ".pickle"
+SIZE_ESTIMATE_FILE_NAME = "size-estimate"
+
+
+@dataclass
+class CacheStats:
+    entries: int = 0
+    size_bytes: int = 0
+    # (entries, size in bytes) per artifact kind
+    kinds: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+
+class ArtifactStore:
+    """Artifacts of GDScript code kept on the disk.
+    Failing to read or write the store is never an error, it's a cache miss.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+    ):
+        self.directory = (
+            directory
+            if directory is not None
+            else os.path.join(get_cache_directory(), "gdtoolkit", "artifacts")
+        )
+        self.max_size_bytes = max_size_bytes
+        self._version = get_gdtoolkit_version()
+        self._written_bytes = 0
+
+    def get(self, kind: str, code: str, options: Any = None) -> Optional[Any]:
+        """Returns the artifact of code or None if there is none.
+        Options must have the same repr() whenever they mean the same."""
+        artifact_path = self._artifact_path(kind, code, options)
+        try:
+            with open(artifact_path, "rb") as fh:
+                artifact = pickle.load(fh)
+            os.utime(artifact_path)
+        except Exception:  # pylint: disable=broad-except
+            return None
+        return artifact
+
+    def put(self, kind: str, code: str, artifact: Any, options: Any = None) -> None:
+        """Stores the artifact of code, None artifacts can't be stored"""
+        artifact_path = self._artifact_path(kind, code, options)
+        try:
+            os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+            # readers must never see partially written files
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(artifact_path))
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    pickle.dump(artifact, fh)
+                    written_bytes = max(fh.tell(), BLOCK_SIZE_BYTES)
+                os.replace(temp_path, artifact_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self._written_bytes += written_bytes
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def save(self) -> None:
+        """Evicts the least recently used artifacts if anything was written
+        and the estimated size of the store exceeds its size cap"""
+        if self._written_bytes == 0:
+            return
+        size_bytes = self._read_size_estimate()
+        if size_bytes is None:
+            size_bytes = sum(size for _, _, size, _ in self._list_artifacts())
+        else:
+            size_bytes += self._written_bytes
+        self._written_bytes = 0
+        if size_bytes > self.max_size_bytes:
+            size_bytes = self.evict(self.max_size_bytes)
+        self._write_size_estimate(size_bytes)
+
+    def evict(self, max_size_bytes: int) -> int:
+        """Removes the least recently used artifacts until the store
+        takes at most max_size_bytes, returns the size left"""
+        artifacts = self._list_artifacts()
+        size_bytes = sum(size for _, _, size, _ in artifacts)
+        for _, artifact_path, size, _ in sorted(artifacts, key=lambda a: a[3]):
+            if size_bytes <= max_size_bytes:
+                break
+            try:
+                os.unlink(artifact_path)
+            except OSError:
+                pass  # removed by some other process
+            size_bytes -= size
+        return size_bytes
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> CacheStats:
+        stats = CacheStats()
+        for kind, _, size, _ in self._list_artifacts():
+            entries, size_bytes = stats.kinds.get(kind, (0, 0))
+            stats.kinds[kind] = (entries + 1, size_bytes + size)
+            stats.entries += 1
+            stats.size_bytes += size
+        return stats
+
+    def _artifact_path(self, kind: str, code: str, options: Any) -> str:
+        key = _hash("\0".join([_hash(code), kind, self._version, _hash(repr(options))]))
+        return os.path.join(
+            self.directory, kind, key[:2], key + ARTIFACT_FILE_EXTENSION
+        )
+
+    def _read_size_estimate(self) -> Optional[int]:
+        # the estimate is shared by parallel workers, so it may be off a bit,
+        # unreadable estimates are recomputed
+        try:
+            with open(os.path.join(self.directory, SIZE_ESTIMATE_FILE_NAME), "r") as fh:
+                return int(fh.read())
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    def _write_size_estimate(self, size_bytes: int) -> None:
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory)
+            try:
+                with os.fdopen(fd, "w") as fh:
+                    fh.write(str(size_bytes))
+                os.replace(
+                    temp_path, os.path.join(self.directory, SIZE_ESTIMATE_FILE_NAME)
+                )
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            pass
+
+    def _list_artifacts(self) -> List[Tuple[str, str, int, float]]:
+        # (kind, path, size in bytes, last use time) of each artifact
+        artifacts = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            kind = os.path.relpath(dirpath, self.directory).split(os.sep)[0]
+            for filename in filenames:
+                if not filename.endswith(ARTIFACT_FILE_EXTENSION):
+                    continue
+                artifact_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(artifact_path)
+                except OSError:
+                    continue
+                size = max(stat.st_size, BLOCK_SIZE_BYTES)
+                artifacts.append((kind, artifact_path, size, stat.st_mtime))
+        return artifacts
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
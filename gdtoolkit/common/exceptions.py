@@ -10,3 +10,9 @@ def lark_unexpected_token_to_str(exception: lark.exceptions.UnexpectedToken, cod
         return f"{exception.get_context(code)}\n{exception}".strip()
     except:  # pylint: disable=bare-except # noqa: E722, B001
         return f"{exception}".strip()
+
+
+def lark_syntax_error_to_str(exception: lark.exceptions.UnexpectedInput, code: str):
+    if isinstance(exception, lark.exceptions.UnexpectedToken):
+        return lark_unexpected_token_to_str(exception, code)
+    return lark_unexpected_input_to_str(exception)
@@ -0,0 +1,111 @@
+"""
+Subset of .gitignore semantics needed to skip files while looking for scripts:
+comments, negation, directory-only and anchored patterns, and '*', '?', '**'
+and '[...]' wildcards. Patterns are applied relative to the directory
+containing the .gitignore file.
+"""
+import os
+import re
+from typing import List, Optional, Pattern, Tuple
+
+Path = str
+
+GITIGNORE_FILE_NAME = ".gitignore"
+
+
+class GitignorePatterns:
+    """Patterns of a single .gitignore file"""
+
+    def __init__(self, base_dir: Path, lines: List[str]):
+        self.base_dir = base_dir
+        # (regex, negated, directory only) in order of appearance
+        self._patterns = []  # type: List[Tuple[Pattern, bool, bool]]
+        for line in lines:
+            pattern = _parse_line(line)
+            if pattern is not None:
+                self._patterns.append(pattern)
+
+    @staticmethod
+    def from_directory(directory: Path) -> Optional["GitignorePatterns"]:
+        """Loads patterns from a .gitignore in directory if there is any"""
+        try:
+            with open(
+                os.path.join(directory, GITIGNORE_FILE_NAME), "r", encoding="utf-8"
+            ) as fh:
+                return GitignorePatterns(directory, fh.read().splitlines())
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def match(self, path: Path, is_dir: bool) -> Optional[bool]:
+        """Returns True if path is ignored, False if it is explicitly re-included
+        and None if no pattern matches it"""
+        relative_path = os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+        for regex, negated, directory_only in reversed(self._patterns):
+            if directory_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                return not negated
+        return None
+
+
+def is_ignored(path: Path, is_dir: bool, patterns: List[GitignorePatterns]) -> bool:
+    """Checks path against patterns ordered from the outermost directory"""
+    for directory_patterns in reversed(patterns):
+        ignored = directory_patterns.match(path, is_dir)
+        if ignored is not None:
+            return ignored
+    return False
+
+
+def _parse_line(line: str) -> Optional[Tuple[Pattern, bool, bool]]:
+    line = line.rstrip()
+    if line == "" or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if line == "":
+        return None
+    anchored = "/" in line
+    line = line.lstrip("/")
+    prefix = "" if anchored else "(?:.*/)?"
+    return (re.compile(prefix + _translate(line) + "$"), negated, directory_only)
+
+
+def _translate(glob: str) -> str:
+    regex = ""
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif glob.startswith("/**", i) and i + 3 == len(glob):
+            regex += "/.*"
+            i += 3
+        elif glob.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif glob[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif glob[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif glob[i] == "[" and "]" in glob[i + 2 :]:
+            end = glob.index("]", i + 2)
+            characters = glob[i + 1 : end]
+            if characters.startswith("!"):
+                characters = "^" + characters[1:]
+            regex += "[{}]".format(characters.replace("\\", "\\\\"))
+            i = end + 1
+        elif glob[i] == "\\" and i + 1 < len(glob):
+            regex += re.escape(glob[i + 1])
+            i += 2
+        else:
+            regex += re.escape(glob[i])
+            i += 1
+    return regex
@@ -0,0 +1,108 @@
+"""
+Minimal reader of Godot project files. Only what is needed while looking for
+scripts is extracted: autoloads and the main scene from project.godot and
+scripts referenced by scenes (.tscn) those point to. Only res:// paths are
+resolved, references by uid:// (used by Godot 4 e.g. for the main scene) are
+skipped as resolving them requires the engine's uid cache.
+"""
+import os
+import re
+from typing import List, Optional
+
+Path = str
+
+PROJECT_FILE_NAME = "project.godot"
+# directories managed by the engine, they never contain user scripts
+ENGINE_DIRECTORIES = frozenset({".import", ".godot", ".mono"})
+
+_SECTION_REGEX = re.compile(r"^\[(?P<name>[^\]]+)\]$")
+_ENTRY_REGEX = re.compile(r'^(?P<key>[^=\s]+)\s*=\s*"(?P<value>[^"]*)"$')
+_EXT_RESOURCE_REGEX = re.compile(r"^\[ext_resource\s(?P<attributes>[^\]]*)\]")
+_ATTRIBUTE_REGEX = re.compile(r'(?P<name>\w+)="(?P<value>[^"]*)"')
+_RESOURCE_PREFIX = "res://"
+
+
+class GodotProject:
+    """Godot project rooted in a directory containing project.godot"""
+
+    def __init__(self, directory: Path, lines: List[str]):
+        self.directory = directory
+        self.autoloads = []  # type: List[Path]
+        self.main_scene = None  # type: Optional[Path]
+        section = None
+        for line in lines:
+            line = line.strip()
+            section_match = _SECTION_REGEX.match(line)
+            if section_match is not None:
+                section = section_match.group("name")
+                continue
+            entry_match = _ENTRY_REGEX.match(line)
+            if entry_match is None:
+                continue
+            key, value = entry_match.group("key"), entry_match.group("value")
+            if section == "autoload":
+                # '*' marks autoloads which are also global singletons
+                path = self.resource_to_path(value.lstrip("*"))
+                if path is not None:
+                    self.autoloads.append(path)
+            elif section == "application" and key == "run/main_scene":
+                self.main_scene = self.resource_to_path(value)
+
+    @staticmethod
+    def from_directory(directory: Path) -> Optional["GodotProject"]:
+        """Loads project.godot from directory if there is any"""
+        try:
+            with open(
+                os.path.join(directory, PROJECT_FILE_NAME), "r", encoding="utf-8"
+            ) as fh:
+                return GodotProject(directory, fh.read().splitlines())
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def resource_to_path(self, resource: str) -> Optional[Path]:
+        """Converts res:// path to the filesystem one, None for other paths"""
+        if not resource.startswith(_RESOURCE_PREFIX):
+            return None
+        return os.path.join(
+            self.directory, *resource[len(_RESOURCE_PREFIX) :].split("/")
+        )
+
+    def important_scripts(self) -> List[Path]:
+        """Returns existing scripts of autoloads and of the main scene,
+        the scripts which are loaded whenever the project runs"""
+        scripts = []  # type: List[Path]
+        resources = self.autoloads + (
+            [self.main_scene] if self.main_scene is not None else []
+        )
+        for resource_path in resources:
+            if resource_path.endswith(".gd"):
+                candidates = [resource_path]
+            elif resource_path.endswith(".tscn"):
+                candidates = self._scene_scripts(resource_path)
+            else:
+                continue
+            for script in candidates:
+                if script not in scripts and os.path.isfile(script):
+                    scripts.append(script)
+        return scripts
+
+    def _scene_scripts(self, scene_path: Path) -> List[Path]:
+        try:
+            with open(scene_path, "r", encoding="utf-8") as fh:
+                lines = fh.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return []
+        scripts = []
+        for line in lines:
+            resource_match = _EXT_RESOURCE_REGEX.match(line)
+            if resource_match is None:
+                continue
+            attributes = dict(
+                _ATTRIBUTE_REGEX.findall(resource_match.group("attributes"))
+            )
+            if attributes.get("type") != "Script":
+                continue
+            path = self.resource_to_path(attributes.get("path", ""))
+            if path is not None and path.endswith(".gd"):
+                scripts.append(path)
+        return scripts
@@ -0,0 +1,203 @@
+"""
+Records spans of work (parsing, linting, formatting, ...) in Chrome trace event
+format, so that traces can be inspected in Perfetto or chrome://tracing.
+Tracing is enabled with --trace=<file> option of the tools or GDTOOLKIT_TRACE
+environment variable. The same spans are used to report peak memory allocated
+in each phase (see enable_memory_report). When both are disabled, spans cost
+a single check.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+TRACE_ENV_VARIABLE = "GDTOOLKIT_TRACE"
+
+Function = TypeVar("Function", bound=Callable[..., Any])
+
+# None when tracing is disabled
+_events = None  # type: Optional[List[Dict[str, Any]]]
+_file_path = None  # type: Optional[str]
+# peak allocations (in bytes) per file and span name, None when disabled
+_memory_peaks = None  # type: Optional[Dict[Tuple[Optional[str], str], int]]
+# peak allocations seen so far by each of the open spans
+_open_spans_memory_peaks = []  # type: List[int]
+_recording = False
+
+
+def enable_tracing(trace_file_path: Optional[str]) -> None:
+    """Enables tracing if trace_file_path or GDTOOLKIT_TRACE is set,
+    the trace is written to that file at exit"""
+    trace_file_path = (
+        trace_file_path
+        if trace_file_path is not None
+        else os.environ.get(TRACE_ENV_VARIABLE)
+    )
+    if trace_file_path is None or trace_file_path == "":
+        return
+    start_collecting()
+    atexit.register(_save_trace, trace_file_path, os.getpid())
+
+
+def start_collecting() -> None:
+    """Enables tracing without writing the trace (e.g. in worker processes)"""
+    global _events, _recording  # pylint: disable=global-statement
+    if _events is None:
+        _events = []
+    _recording = True
+
+
+def enable_memory_report() -> None:
+    """Starts tracking peak memory allocated in each span,
+    the report is printed to stderr at exit"""
+    global _memory_peaks, _recording  # pylint: disable=global-statement
+    if not hasattr(tracemalloc, "reset_peak"):
+        sys.exit("Memory report requires Python 3.9 or newer")
+    tracemalloc.start()
+    _memory_peaks = {}
+    _recording = True
+    atexit.register(_print_memory_report, os.getpid())
+
+
+def is_tracing_enabled() -> bool:
+    return _events is not None
+
+
+def pop_events() -> List[Dict[str, Any]]:
+    """Returns events recorded so far and forgets them"""
+    global _events  # pylint: disable=global-statement
+    if _events is None:
+        return []
+    events, _events = _events, []
+    return events
+
+
+def add_events(events: List[Dict[str, Any]]) -> None:
+    """Adds events recorded elsewhere (e.g. in worker processes)"""
+    if _events is not None:
+        _events.extend(events)
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[None]:
+    """Records the time spent in the block along with the file being processed"""
+    if not _recording:
+        yield
+        return
+    if _file_path is not None:
+        args["file"] = _file_path
+    memory_begin = _begin_memory_tracking() if _memory_peaks is not None else 0
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if _memory_peaks is not None:
+            peak = _end_memory_tracking(memory_begin)
+            key = (_file_path, name)
+            _memory_peaks[key] = max(_memory_peaks.get(key, 0), peak)
+            args["peak_memory"] = peak
+        if _events is not None:
+            _events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": begin * 1e6,
+                    "dur": (end - begin) * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+
+
+def traced(function: Function) -> Function:
+    """Decorator recording a span named after the function for each call"""
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _recording:
+            return function(*args, **kwargs)
+        with span(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper  # type: ignore
+
+
+def file_spans(file_paths: Iterable[str]) -> Iterator[str]:
+    """Yields file paths, each of them is processed within its file_span"""
+    if not _recording:
+        yield from file_paths
+        return
+    for file_path in file_paths:
+        with file_span(file_path):
+            yield file_path
+
+
+@contextmanager
+def file_span(file_path: str) -> Iterator[None]:
+    """Records processing of a file, spans within are tagged with its path"""
+    global _file_path  # pylint: disable=global-statement
+    previous_file_path = _file_path
+    _file_path = file_path
+    try:
+        with span("file"):
+            yield
+    finally:
+        _file_path = previous_file_path
+
+
+def _begin_memory_tracking() -> int:
+    # tracemalloc has a single peak counter, so it's reset at the beginning
+    # of each span and the peaks seen by enclosing spans are kept aside
+    current, peak = tracemalloc.get_traced_memory()
+    if len(_open_spans_memory_peaks) > 0:
+        _open_spans_memory_peaks[-1] = max(_open_spans_memory_peaks[-1], peak)
+    tracemalloc.reset_peak()  # type: ignore
+    _open_spans_memory_peaks.append(0)
+    return current
+
+
+def _end_memory_tracking(memory_begin: int) -> int:
+    _, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, _open_spans_memory_peaks.pop())
+    if len(_open_spans_memory_peaks) > 0:
+        _open_spans_memory_peaks[-1] = max(_open_spans_memory_peaks[-1], peak)
+    return peak - memory_begin
+
+
+def _print_memory_report(owner_pid: int) -> None:
+    if os.getpid() != owner_pid or _memory_peaks is None:
+        return
+    print("Peak memory allocated (MiB):", file=sys.stderr)
+    for (file_path, name), peak in _memory_peaks.items():
+        print(
+            "  {}: {} {:.2f}".format(
+                file_path if file_path is not None else "-", name, peak / 2**20
+            ),
+            file=sys.stderr,
+        )
+
+
+def _save_trace(trace_file_path: str, owner_pid: int) -> None:
+    # forked worker processes must not overwrite the trace
+    if os.getpid() != owner_pid or _events is None:
+        return
+    with open(trace_file_path, "w", encoding="utf-8") as fh:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, fh)
@@ -1,21 +1,138 @@
 import os
-from typing import FrozenSet, List
+import sys
+from typing import FrozenSet, Iterable, Iterator, List
+
+from .gitignore import GitignorePatterns, is_ignored
+from .godot_project import ENGINE_DIRECTORIES, PROJECT_FILE_NAME, GodotProject
 
 Path = str
 
+GDIGNORE_FILE_NAME = ".gdignore"
+
 
 def find_gd_files_from_paths(
-    paths: List[Path], excluded_directories: FrozenSet[Path] = frozenset()
-) -> List[Path]:
-    """Finds .gd files in directories recursively and combines results to the list"""
-    files = []
+    paths: Iterable[Path],
+    excluded_directories: FrozenSet[Path] = frozenset(),
+    use_gitignore: bool = False,
+    project_scripts_first: bool = False,
+) -> Iterator[Path]:
+    """Finds .gd files in directories recursively and yields them as they are found.
+    Directories containing .gdignore (like in Godot) are skipped and so are
+    engine-managed directories of Godot projects and the ones ignored
+    by .gitignore files if use_gitignore is set. If project_scripts_first is set,
+    autoload and main scene scripts of a project.godot found in a given
+    directory are yielded before the others, unless they would be skipped.
+    """
     for path in paths:
-        if os.path.isdir(path):
-            for dirpath, dirnames, filenames in os.walk(path, topdown=True):
-                dirnames[:] = [d for d in dirnames if d not in excluded_directories]
-                files += [
-                    os.path.join(dirpath, f) for f in filenames if f.endswith(".gd")
-                ]
-        else:
-            files.append(path)
-    return files
+        if not os.path.isdir(path):
+            yield path
+            continue
+        found_files = _find_gd_files_in_directory(
+            path, excluded_directories, use_gitignore, []
+        )
+        project = GodotProject.from_directory(path) if project_scripts_first else None
+        if project is None:
+            yield from found_files
+            continue
+        important_scripts = [
+            script
+            for script in project.important_scripts()
+            if _is_found_in_directory(path, script, excluded_directories, use_gitignore)
+        ]
+        yield from important_scripts
+        yielded = {os.path.normpath(script) for script in important_scripts}
+        for file_path in found_files:
+            if os.path.normpath(file_path) not in yielded:
+                yield file_path
+
+
+def _find_gd_files_in_directory(
+    directory: Path,
+    excluded_directories: FrozenSet[Path],
+    use_gitignore: bool,
+    gitignore_patterns: List[GitignorePatterns],
+) -> Iterator[Path]:
+    try:
+        with os.scandir(directory) as entries_iterator:
+            entries = sorted(entries_iterator, key=lambda entry: entry.name)
+    except OSError:
+        return
+    if any(entry.name == GDIGNORE_FILE_NAME for entry in entries):
+        return
+    is_project_root = any(entry.name == PROJECT_FILE_NAME for entry in entries)
+    if use_gitignore:
+        directory_patterns = GitignorePatterns.from_directory(directory)
+        if directory_patterns is not None:
+            gitignore_patterns = gitignore_patterns + [directory_patterns]
+    subdirectories = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            continue
+        if is_ignored(entry.path, is_dir, gitignore_patterns):
+            continue
+        if not is_dir:
+            if entry.name.endswith(".gd"):
+                yield entry.path
+        elif (
+            entry.name not in excluded_directories
+            and not (is_project_root and entry.name in ENGINE_DIRECTORIES)
+            and not entry.is_symlink()
+        ):
+            subdirectories.append(entry.path)
+    for subdirectory in subdirectories:
+        yield from _find_gd_files_in_directory(
+            subdirectory, excluded_directories, use_gitignore, gitignore_patterns
+        )
+
+
+def _is_found_in_directory(
+    directory: Path,
+    file_path: Path,
+    excluded_directories: FrozenSet[Path],
+    use_gitignore: bool,
+) -> bool:
+    # Checks whether _find_gd_files_in_directory would find the file,
+    # without walking the whole directory
+    names = os.path.relpath(file_path, directory).split(os.sep)
+    if names[0] == os.pardir:
+        return False
+    gitignore_patterns = []  # type: List[GitignorePatterns]
+    for name_ix, name in enumerate(names):
+        if os.path.exists(os.path.join(directory, GDIGNORE_FILE_NAME)):
+            return False
+        if use_gitignore:
+            directory_patterns = GitignorePatterns.from_directory(directory)
+            if directory_patterns is not None:
+                gitignore_patterns = gitignore_patterns + [directory_patterns]
+        path = os.path.join(directory, name)
+        is_dir = name_ix < len(names) - 1
+        if is_ignored(path, is_dir, gitignore_patterns):
+            return False
+        if is_dir and (
+            name in excluded_directories
+            or os.path.islink(path)
+            or (
+                name in ENGINE_DIRECTORIES
+                and os.path.exists(os.path.join(directory, PROJECT_FILE_NAME))
+            )
+        ):
+            return False
+        directory = path
+    return True
+
+
+def get_cache_directory() -> str:
+    """Returns the cache directory based on the user's operating system"""
+    directory: str = ""
+    if sys.platform in ["linux", "linux2"]:
+        # relative paths are invalid as per the XDG Base Directory Specification
+        directory = os.environ.get("XDG_CACHE_HOME", "")
+        if not os.path.isabs(directory):
+            directory = os.path.join(os.path.expanduser("~"), ".cache")
+    elif sys.platform == "darwin":
+        directory = os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    elif sys.platform == "win32":
+        directory = os.path.expandvars(r"%LOCALAPPDATA%")
+    return directory
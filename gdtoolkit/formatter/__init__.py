@@ -1,43 +1,33 @@
-from typing import Optional
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-from lark import Tree
+if TYPE_CHECKING:
+    from .formatter import format_code  # noqa: F401
+    from .safety_checks import (  # noqa: F401
+        check_formatting_safety,
+        check_tree_invariant,
+        check_formatting_stability,
+        check_comment_persistence,
+        find_unchanged_statements,
+        find_changed_lines,
+        LoosenTreeTransformer,
+    )
 
-from ..parser import parser
-from .formatter import format_code  # noqa: F401
-from .safety_checks import (  # noqa: F401
-    check_tree_invariant,
-    check_formatting_stability,
-    check_comment_persistence,
-    LoosenTreeTransformer,
-)
+# Formatter and safety checks are loaded upon first use only, so that
+# the modules which don't need them (e.g. cache) don't pull in the parser.
+_LAZY_ATTRIBUTES = {
+    "format_code": ".formatter",
+    "check_formatting_safety": ".safety_checks",
+    "check_tree_invariant": ".safety_checks",
+    "check_formatting_stability": ".safety_checks",
+    "check_comment_persistence": ".safety_checks",
+    "find_unchanged_statements": ".safety_checks",
+    "find_changed_lines": ".safety_checks",
+    "LoosenTreeTransformer": ".safety_checks",
+}
 
 
-def check_formatting_safety(
-    given_code: str,
-    formatted_code: str,
-    max_line_length: int,
-    given_code_parse_tree: Optional[Tree] = None,
-    given_code_comment_parse_tree: Optional[Tree] = None,
-) -> None:
-    if given_code == formatted_code:
-        return
-    formatted_code_parse_tree = parser.parse(formatted_code, gather_metadata=True)
-    formatted_code_comment_parse_tree = parser.parse_comments(formatted_code)
-    check_comment_persistence(
-        given_code,
-        formatted_code,
-        given_code_comment_parse_tree=given_code_comment_parse_tree,
-        formatted_code_comment_parse_tree=formatted_code_comment_parse_tree,
-    )
-    check_tree_invariant(
-        given_code,
-        formatted_code,
-        given_code_parse_tree=given_code_parse_tree,
-        formatted_code_parse_tree=formatted_code_parse_tree,
-    )
-    check_formatting_stability(
-        formatted_code,
-        max_line_length,
-        parse_tree=formatted_code_parse_tree,
-        comment_parse_tree=formatted_code_comment_parse_tree,
-    )
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
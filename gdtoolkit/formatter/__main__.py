@@ -6,6 +6,8 @@ consistent way.
 
 Usage:
   gdformat <path>... [options]
+  gdformat --serve [options]
+  gdformat --batch [options]
 
 Options:
   -c --check                 Don't write the files back,
@@ -13,36 +15,74 @@ Options:
   -d --diff                  Don't write the files back,
                              just suggest formatting changes
                              (implies --check).
+  --diff-context=<int>       How many lines of context to show in diff.
+                             [default: 3]
+  --diff-max-hunks=<int>     How many hunks to show per file in diff.
   -f --fast                  Skip safety checks.
+  --no-cache                 Don't use the cache of already formatted files.
+  --gitignore                Skip files and directories ignored by .gitignore.
+  --project-scripts-first    Process autoload and main scene scripts first.
+  --lines=<start:end>        Format only statements intersecting given range
+                             of lines (1-based, inclusive).
   -l --line-length=<int>     How many characters per line to allow.
                              [default: 100]
+  --trace=<file>             Write Chrome trace of the run to the file.
+  --memory-report            Print peak memory allocated in each phase
+                             of formatting each file (Python 3.9+).
+  --max-file-bytes=<int>     Skip files bigger than that.
+  --serve                    Keep running and format code sent to STDIN
+                             in requests (see below).
+  --batch                    Format JSON lines documents from STDIN
+                             (see below).
   -h --help                  Show this screen.
   --version                  Show version.
 
 Examples:
   echo 'tool' | gdformat -   # reads from STDIN
+
+Server mode:
+  Each request consists of a '<code length> <line length>' header line
+  followed by the code encoded in UTF-8, where code length is in bytes.
+  Each response consists of a '<ok|error> <length>' header line followed
+  by either formatted code or an error message encoded in UTF-8.
+  The server stops upon a header without a valid code length.
+
+Batch mode:
+  Each line of STDIN is a JSON object with 'code' and optional 'line_length'
+  (defaults to --line-length) keys. For each of them, a JSON object with
+  either 'code' (formatted) or 'error' key is printed in the same order.
+  Exit code is 1 if any of the documents failed to format.
 """
+import io
+import json
+import os
 import sys
-import difflib
-from typing import List, Tuple
+import shutil
+import tempfile
+from contextlib import redirect_stderr
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
 
 from docopt import docopt
 
-from gdtoolkit.formatter import format_code, check_formatting_safety
+from gdtoolkit.formatter.cache import FormattingCache
+from gdtoolkit.formatter.diff import unified_diff
 from gdtoolkit.formatter.exceptions import (
     TreeInvariantViolation,
     FormattingStabilityViolation,
     CommentPersistenceViolation,
 )
-from gdtoolkit.parser import parser
-from gdtoolkit.common.utils import find_gd_files_from_paths
-from gdtoolkit.common.exceptions import (
-    lark_unexpected_token_to_str,
-    lark_unexpected_input_to_str,
+from gdtoolkit.common.tracing import (
+    enable_memory_report,
+    enable_tracing,
+    file_span,
+    file_spans,
+    span,
 )
+from gdtoolkit.common.utils import find_gd_files_from_paths
 from gdtoolkit.common.version import get_gdtoolkit_version
 
-import lark
+# how many requests the server handles between saving the caches
+SERVER_CACHE_SAVING_PERIOD = 100
 
 
 def main():
@@ -52,76 +92,247 @@ def main():
         version="gdformat {}".format(get_gdtoolkit_version()),
     )
 
+    enable_tracing(arguments["--trace"])
+    if arguments["--memory-report"]:
+        enable_memory_report()
+
     if arguments["--diff"]:
         arguments["--check"] = True
 
     line_length = int(arguments["--line-length"])
     safety_checks = not arguments["--fast"]
-    files: List[str] = find_gd_files_from_paths(
-        arguments["<path>"], excluded_directories=set(".git")
+    line_range = _parse_line_range(arguments["--lines"])
+    # documents sent to --serve and --batch come with their own line lengths
+    caches = (
+        None if arguments["--no-cache"] else {}
+    )  # type: Optional[Dict[int, FormattingCache]]
+    if arguments["--serve"]:
+        _serve(safety_checks, caches)
+        return
+    if arguments["--batch"]:
+        _format_batch(line_length, safety_checks, caches)
+        return
+    cache = (
+        None
+        if arguments["--no-cache"] or line_range is not None
+        else FormattingCache(line_length)
     )
 
-    if files == ["-"]:
-        _format_stdin(line_length, safety_checks)
+    files = find_gd_files_from_paths(
+        arguments["<path>"],
+        excluded_directories=frozenset({".git"}),
+        use_gitignore=arguments["--gitignore"],
+        project_scripts_first=arguments["--project-scripts-first"],
+    )
+    if arguments["--max-file-bytes"] is not None:
+        files = _skip_big_files(files, int(arguments["--max-file-bytes"]))
+
+    if arguments["<path>"] == ["-"]:
+        _format_stdin(line_length, safety_checks, cache, line_range)
     elif arguments["--check"]:
-        _check_files_formatting(files, line_length, arguments["--diff"], safety_checks)
+        _check_files_formatting(
+            files,
+            line_length,
+            _parse_diff_options(arguments),
+            safety_checks,
+            cache,
+            line_range,
+        )
     else:
-        _format_files(files, line_length, safety_checks)
+        _format_files(files, line_length, safety_checks, cache, line_range)
+
+
+def _parse_line_range(line_range: Optional[str]) -> Optional[Tuple[int, int]]:
+    if line_range is None:
+        return None
+    try:
+        begin, end = [int(line) for line in line_range.split(":")]
+    except ValueError:
+        sys.exit("Invalid line range '{}', expected START:END".format(line_range))
+    return (begin, end)
+
+
+def _parse_diff_options(arguments: dict) -> Optional[Tuple[int, Optional[int]]]:
+    if not arguments["--diff"]:
+        return None
+    max_hunks = arguments["--diff-max-hunks"]
+    return (
+        int(arguments["--diff-context"]),
+        int(max_hunks) if max_hunks is not None else None,
+    )
+
+
+def _skip_big_files(files: Iterable[str], max_file_bytes: int) -> Iterator[str]:
+    for file_path in files:
+        try:
+            file_bytes = os.stat(file_path).st_size
+        except OSError:
+            file_bytes = 0  # error will be reported upon opening
+        if file_bytes > max_file_bytes:
+            print(
+                "Skipping file '{}' as it has {} bytes".format(file_path, file_bytes),
+                file=sys.stderr,
+            )
+            continue
+        yield file_path
+
+
+def _serve(safety_checks: bool, caches: Optional[Dict[int, FormattingCache]]) -> None:
+    requests = sys.stdin.buffer
+    responses = sys.stdout.buffer
+    requests_num = 0
+    while True:
+        header = requests.readline()
+        if header == b"":
+            break
+        fields = header.split()
+        try:
+            code_length = int(fields[0])
+        except (IndexError, ValueError):
+            code_length = -1
+        if code_length < 0:
+            # the payload can't be skipped, so the next request can't be found
+            _respond(responses, "error", "Invalid request header")
+            break
+        payload = requests.read(code_length)
+        if len(payload) < code_length:
+            break
+        try:
+            (line_length,) = [int(value) for value in fields[1:]]
+        except ValueError:
+            _respond(responses, "error", "Invalid request header")
+            continue
+        try:
+            code = payload.decode("utf-8")
+        except UnicodeDecodeError:
+            _respond(responses, "error", "Request payload is not valid UTF-8")
+            continue
+        try:
+            success, output = _format_document(code, line_length, safety_checks, caches)
+        except Exception as e:  # pylint: disable=broad-except
+            success, output = False, "Unexpected error: {}".format(e)
+        _respond(responses, "ok" if success else "error", output)
+        requests_num += 1
+        if requests_num % SERVER_CACHE_SAVING_PERIOD == 0:
+            _save_caches(caches)
+    _save_caches(caches)
+
+
+def _format_batch(
+    default_line_length: int,
+    safety_checks: bool,
+    caches: Optional[Dict[int, FormattingCache]],
+) -> None:
+    failed_documents_num = 0
+    documents_num = 0
+    for line in sys.stdin:
+        if line.strip() == "":
+            continue
+        documents_num += 1
+        try:
+            document = json.loads(line)
+            code = document["code"]
+            line_length = int(document.get("line_length", default_line_length))
+        except (ValueError, TypeError, KeyError, AttributeError):
+            success, output = False, "Invalid document #{}".format(documents_num)
+        else:
+            try:
+                success, output = _format_document(
+                    code, line_length, safety_checks, caches
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                success, output = False, "Unexpected error: {}".format(e)
+        if not success:
+            failed_documents_num += 1
+        print(json.dumps({"code" if success else "error": output}), flush=True)
+    _save_caches(caches)
+    sys.exit(0 if failed_documents_num == 0 else 1)
+
+
+def _format_document(
+    code: str,
+    line_length: int,
+    safety_checks: bool,
+    caches: Optional[Dict[int, FormattingCache]],
+) -> Tuple[bool, str]:
+    # Returns formatted code or, on failure, the error message
+    cache = None
+    if caches is not None:
+        cache = caches.setdefault(line_length, FormattingCache(line_length))
+    errors = io.StringIO()
+    with redirect_stderr(errors), file_span("STDIN"):
+        success, _, formatted_code = _format_code(
+            code, line_length, "STDIN", safety_checks, cache
+        )
+    return success, formatted_code if success else errors.getvalue()
 
 
-def _format_stdin(line_length: int, safety_checks: bool) -> None:
-    code = sys.stdin.read()
-    success, _, formatted_code = _format_code(code, line_length, "STDIN", safety_checks)
+def _respond(responses: BinaryIO, status: str, payload: str) -> None:
+    payload_bytes = payload.encode("utf-8")
+    responses.write("{} {}\n".format(status, len(payload_bytes)).encode("utf-8"))
+    responses.write(payload_bytes)
+    responses.flush()
+
+
+def _format_stdin(
+    line_length: int,
+    safety_checks: bool,
+    cache: Optional[FormattingCache],
+    line_range: Optional[Tuple[int, int]],
+) -> None:
+    with file_span("STDIN"):
+        code = sys.stdin.read()
+        success, _, formatted_code = _format_code(
+            code, line_length, "STDIN", safety_checks, cache, line_range
+        )
+    _save_cache(cache)
     if not success:
         sys.exit(1)
     print(formatted_code, end="")
 
 
 def _check_files_formatting(
-    files: List[str], line_length: int, print_diff: bool, safety_checks: bool
+    files: Iterable[str],
+    line_length: int,
+    diff_options: Optional[Tuple[int, Optional[int]]],
+    safety_checks: bool,
+    cache: Optional[FormattingCache],
+    line_range: Optional[Tuple[int, int]],
 ) -> None:
+    files_num = 0
     formattable_files = set()
     failed_files = set()
-    for file_path in files:
+    for file_path in file_spans(files):
+        files_num += 1
         try:
-            with open(file_path, "r", encoding="utf-8") as fh:
+            with span("read"), open(file_path, "r", encoding="utf-8") as fh:
                 code = fh.read()
-                success, actually_formatted, formatted_code = _format_code(
-                    code, line_length, file_path, safety_checks
-                )
-                if success and actually_formatted:
-                    print("would reformat {}".format(file_path), file=sys.stderr)
-                    if print_diff:
-                        print(
-                            "\n".join(
-                                difflib.unified_diff(
-                                    code.splitlines(),
-                                    formatted_code.splitlines(),
-                                    file_path,
-                                    file_path,
-                                    lineterm="",
-                                )
-                            ),
-                            file=sys.stderr,
-                        )
-                    formattable_files.add(file_path)
-                elif not success:
-                    failed_files.add(file_path)
+            success, actually_formatted, formatted_code = _format_code(
+                code, line_length, file_path, safety_checks, cache, line_range
+            )
+            if success and actually_formatted:
+                print("would reformat {}".format(file_path), file=sys.stderr)
+                if diff_options is not None:
+                    _print_diff(code, formatted_code, file_path, diff_options)
+                formattable_files.add(file_path)
+            elif not success:
+                failed_files.add(file_path)
         except OSError as e:
             print(
                 "Cannot open file '{}': {}".format(file_path, e.strerror),
                 file=sys.stderr,
             )
             failed_files.add(file_path)
+    _save_cache(cache)
     if len(formattable_files) == 0:
         print(
             "{} file{} would be left unchanged".format(
-                len(files), "s" if len(files) != 1 else ""
+                files_num, "s" if files_num != 1 else ""
             )
         )
         sys.exit(0 if len(failed_files) == 0 else 1)
     formattable_num = len(formattable_files)
-    left_unchanged_num = len(files) - formattable_num
+    left_unchanged_num = files_num - formattable_num
     print(
         "{} file{} would be reformatted, {} file{} would be left unchanged.".format(
             formattable_num,
@@ -134,32 +345,58 @@ def _check_files_formatting(
     sys.exit(1)
 
 
-def _format_files(files: List[str], line_length: int, safety_checks: bool) -> None:
+def _print_diff(
+    code: str,
+    formatted_code: str,
+    file_path: str,
+    diff_options: Tuple[int, Optional[int]],
+) -> None:
+    context, max_hunks = diff_options
+    for line in unified_diff(
+        code.splitlines(),
+        formatted_code.splitlines(),
+        file_path,
+        file_path,
+        context=context,
+        max_hunks=max_hunks,
+    ):
+        print(line, file=sys.stderr)
+
+
+def _format_files(
+    files: Iterable[str],
+    line_length: int,
+    safety_checks: bool,
+    cache: Optional[FormattingCache],
+    line_range: Optional[Tuple[int, int]],
+) -> None:
+    files_num = 0
     formatted_files = set()
     failed_files = set()
-    for file_path in files:
+    for file_path in file_spans(files):
+        files_num += 1
         try:
-            with open(file_path, "r+", encoding="utf-8") as fh:
+            with span("read"), open(file_path, "r", encoding="utf-8") as fh:
                 code = fh.read()
-                success, actually_formatted, formatted_code = _format_code(
-                    code, line_length, file_path, safety_checks
-                )
-                if success and actually_formatted:
-                    print("reformatted {}".format(file_path))
-                    formatted_files.add(file_path)
-                    fh.seek(0)
-                    fh.truncate(0)
-                    fh.write(formatted_code)
-                elif not success:
-                    failed_files.add(file_path)
+            success, actually_formatted, formatted_code = _format_code(
+                code, line_length, file_path, safety_checks, cache, line_range
+            )
+            if success and actually_formatted:
+                with span("write"):
+                    _write_file_atomically(file_path, formatted_code)
+                print("reformatted {}".format(file_path))
+                formatted_files.add(file_path)
+            elif not success:
+                failed_files.add(file_path)
         except OSError as e:
             print(
                 "Cannot open file '{}': {}".format(file_path, e.strerror),
                 file=sys.stderr,
             )
             failed_files.add(file_path)
+    _save_cache(cache)
     reformatted_num = len(formatted_files)
-    left_unchanged_num = len(files) - reformatted_num
+    left_unchanged_num = files_num - reformatted_num
     print(
         "{} file{} reformatted, {} file{} left unchanged.".format(
             reformatted_num,
@@ -171,13 +408,47 @@ def _format_files(files: List[str], line_length: int, safety_checks: bool) -> No
     sys.exit(0 if len(failed_files) == 0 else 1)
 
 
+def _write_file_atomically(file_path: str, content: str) -> None:
+    # Content is written to a temporary file next to the target which then
+    # replaces the target, so that an interrupted write can't corrupt it.
+    target_path = os.path.realpath(file_path)
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(target_path),
+        prefix=".{}.".format(os.path.basename(target_path)),
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        shutil.copymode(target_path, temp_path)
+        os.replace(temp_path, target_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
 def _format_code(
-    code: str, line_length: int, file_path: str, safety_checks: bool
+    code: str,
+    line_length: int,
+    file_path: str,
+    safety_checks: bool,
+    cache: Optional[FormattingCache] = None,
+    line_range: Optional[Tuple[int, int]] = None,
 ) -> Tuple[bool, bool, str]:
     success = True
     actually_formatted = False
     formatted_code = code
 
+    if cache is not None and cache.contains(code):
+        return success, actually_formatted, formatted_code
+
+    # parser and formatter are imported only when there is code to format
+    # pylint: disable=import-outside-toplevel
+    import lark
+    from gdtoolkit.common.exceptions import lark_syntax_error_to_str
+    from gdtoolkit.formatter import format_code
+    from gdtoolkit.parser import parser
+
     try:
         code_parse_tree = parser.parse(code, gather_metadata=True)
         comment_parse_tree = parser.parse_comments(code)
@@ -186,33 +457,35 @@ def _format_code(
             max_line_length=line_length,
             parse_tree=code_parse_tree,
             comment_parse_tree=comment_parse_tree,
+            line_range=line_range,
         )
         if formatted_code != code:
             actually_formatted = True
             if safety_checks:
+                from gdtoolkit.formatter import check_formatting_safety
+
                 check_formatting_safety(
                     code,
                     formatted_code,
                     max_line_length=line_length,
                     given_code_parse_tree=code_parse_tree,
                     given_code_comment_parse_tree=comment_parse_tree,
+                    line_range=line_range,
                 )
-    except lark.exceptions.UnexpectedToken as e:
-        success = False
-        print(
-            f"{file_path}:\n",
-            lark_unexpected_token_to_str(e, code),
-            sep="\n",
-            file=sys.stderr,
-        )
+        if cache is not None and (not actually_formatted or safety_checks):
+            # formatted code is a fixed point only if it was checked for stability
+            cache.add(formatted_code)
     except lark.exceptions.UnexpectedInput as e:
         success = False
-        print(
-            f"{file_path}:\n",
-            lark_unexpected_input_to_str(e),
-            sep="\n",
-            file=sys.stderr,
-        )
+        # all syntax errors are reported at once, not only the first one
+        syntax_errors = parser.parse_with_error_recovery(code).errors or [e]
+        for syntax_error in syntax_errors:
+            print(
+                f"{file_path}:\n",
+                lark_syntax_error_to_str(syntax_error, code),
+                sep="\n",
+                file=sys.stderr,
+            )
     except TreeInvariantViolation:
         success = False
         print(
@@ -236,5 +509,16 @@ def _format_code(
     return success, actually_formatted, formatted_code
 
 
+def _save_cache(cache: Optional[FormattingCache]) -> None:
+    if cache is not None:
+        cache.save()
+
+
+def _save_caches(caches: Optional[Dict[int, FormattingCache]]) -> None:
+    if caches is not None:
+        for cache in caches.values():
+            cache.save()
+
+
 if __name__ == "__main__":
     main()
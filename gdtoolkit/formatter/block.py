@@ -1,11 +1,11 @@
-import re
 from types import MappingProxyType
 from typing import List, Callable
 
+from lark import Tree
+
 from .types import Outcome, Node, FormattedLines
 from .context import Context
 from .constants import (
-    INDENT_SIZE,
     DEFAULT_SURROUNDING_EMPTY_LINES_TABLE as DEFAULT_SURROUNDINGS_TABLE,
 )
 
@@ -19,11 +19,20 @@ def format_block(
     previous_statement_name = None
     formatted_lines = []  # type: FormattedLines
     previously_processed_line_number = context.previously_processed_line_number
+    last_verbatim_line_number = 0
     for ix, statement in enumerate(statements):
-        # Between-Statements gap handling: if any line in the gap is ignored,
+        # Statements sharing a line (e.g. 'pass;pass') with a statement emitted
+        # verbatim are already emitted along with it.
+        if statement.line <= last_verbatim_line_number:
+            previous_statement_name = statement.data
+            continue
+        # Between-Statements gap handling: if any line in the gap is ignored
+        # (or the gap is out of the line range being formatted),
         # preserve the entire gap verbatim; otherwise reconstruct blanks.
         if _has_ignored_in_range(
             previously_processed_line_number, statement.line, context
+        ) or _is_gap_excluded_from_formatting(
+            previously_processed_line_number, statement.line, context
         ):
             formatted_lines += _verbatim_lines(
                 previously_processed_line_number + 1, statement.line - 1, context
@@ -56,11 +65,21 @@ def format_block(
         else:
             # Fallback to block dedent for last statement in this block.
             next_start_line = _find_dedent_line_number(statement.line, context)
-        stmt_end = _effective_statement_end(statement.line, next_start_line, context)
+        stmt_end = max(
+            _effective_statement_end(statement.line, next_start_line, context),
+            _find_last_line(statement),
+        )
 
-        if _has_ignored_in_span(statement.line, stmt_end, context):
+        # Statements sharing a line with the enclosing header (e.g. inline
+        # 'extends') or with a formatted statement are formatted along with them.
+        is_on_processed_line = statement.line <= previously_processed_line_number
+        if _has_ignored_in_span(statement.line, stmt_end, context) or (
+            not is_on_processed_line
+            and _is_excluded_from_formatting(statement.line, stmt_end, context)
+        ):
             formatted_lines += _verbatim_lines(statement.line, stmt_end, context)
             previously_processed_line_number = stmt_end
+            last_verbatim_line_number = stmt_end
             previous_statement_name = statement.data
             continue
 
@@ -76,6 +95,8 @@ def format_block(
     # otherwise apply existing reconstruction and trimming rules.
     if _has_ignored_in_range(
         previously_processed_line_number, dedent_line_number, context
+    ) or _is_gap_excluded_from_formatting(
+        previously_processed_line_number, dedent_line_number, context
     ):
         formatted_lines += _verbatim_lines(
             previously_processed_line_number + 1, dedent_line_number - 1, context
@@ -97,20 +118,39 @@ def format_block(
 
 def _has_ignored_in_range(begin: int, end: int, context: Context) -> bool:
     # Check if any line in (begin, end) is ignored. Lines are 1-based.
-    if end - begin <= 1:
-        return False
-    return any(context.ignore_mask[i] for i in range(begin + 1, end))
+    return context.has_ignored_lines(begin + 1, end - 1)
 
 
 def _has_ignored_in_span(start_line: int, end_line: int, context: Context) -> bool:
-    if end_line < start_line:
+    return context.has_ignored_lines(start_line, end_line)
+
+
+def _is_excluded_from_formatting(begin: int, end: int, context: Context) -> bool:
+    # Check if none of lines [begin, end] is requested to be formatted.
+    if context.lines_to_format is None:
+        return False
+    return not any(i in context.lines_to_format for i in range(begin, end + 1))
+
+
+def _is_gap_excluded_from_formatting(begin: int, end: int, context: Context) -> bool:
+    # Check if lines in (begin, end) are not requested to be formatted. Empty gap
+    # is formatted only if lines on both sides of it are requested to be formatted.
+    if context.lines_to_format is None:
         return False
-    return any(context.ignore_mask[i] for i in range(start_line, end_line + 1))
+    if end - begin <= 1:
+        return (
+            begin not in context.lines_to_format or end not in context.lines_to_format
+        )
+    return _is_excluded_from_formatting(begin + 1, end - 1, context)
 
 
 def _verbatim_lines(start_line: int, end_line: int, context: Context) -> FormattedLines:
     if start_line > end_line:
         return []
+    # Comments are already in place, so postprocessing mustn't inject them again.
+    for i in range(start_line, end_line + 1):
+        context.standalone_comments[i] = None
+        context.inline_comments[i] = None
     return [
         (None, context.gdscript_code_lines[i]) for i in range(start_line, end_line + 1)
     ]
@@ -119,18 +159,18 @@ def _verbatim_lines(start_line: int, end_line: int, context: Context) -> Formatt
 def _effective_statement_end(
     start_line: int, next_start_line: int, context: Context
 ) -> int:
-    # Walk backwards from the line before next statement and find
-    # the last non-empty, non-comment line to cap the statement span.
+    # The last non-empty, non-comment line before next statement
+    # caps the statement span.
     end = max(start_line, next_start_line - 1)
-    i = end
-    while i >= start_line:
-        line = context.gdscript_code_lines[i]
-        stripped = line.strip()
-        if stripped == "" or stripped.startswith("#"):
-            i -= 1
-            continue
-        break
-    return i if i >= start_line else start_line
+    last_code_line = context.lines_index.find_last_code_line(start_line, end)
+    return last_code_line if last_code_line is not None else start_line
+
+
+def _find_last_line(node: Node) -> int:
+    # Last line of actual code (unlike end_line which may point past dedent).
+    if isinstance(node, Tree) and len(node.children) > 0:
+        return _find_last_line(node.children[-1])
+    return node.end_line
 
 
 def reconstruct_blank_lines_in_range(
@@ -156,7 +196,6 @@ def reconstruct_blank_lines_in_range(
     return list(zip([None for _ in range(begin + 1, end)], reconstructed_lines))
 
 
-# TODO: indent detection & refactoring
 def _find_dedent_line_number(
     previously_processed_line_number: int, context: Context
 ) -> int:
@@ -165,35 +204,9 @@ def _find_dedent_line_number(
         or context.indent == 0
     ):
         return len(context.gdscript_code_lines)
-    line_no = previously_processed_line_number + 1
-    for line in context.gdscript_code_lines[previously_processed_line_number + 1 :]:
-        if (
-            line.startswith(" ")
-            and re.search(r"^ {0,%d}[^ ]+" % (context.indent - 1), line) is not None
-        ):
-            break
-        if (
-            line.startswith("\t")
-            and re.search(
-                r"^\t{0,%d}[^\t]+" % ((context.indent / INDENT_SIZE) - 1), line
-            )
-            is not None
-        ):
-            break
-        if (
-            context.indent > 0
-            and len(line) > 0
-            and not line.startswith(" ")
-            and not line.startswith("\t")
-        ):
-            break
-        line_no += 1
-    for line in context.gdscript_code_lines[line_no - 1 :: -1]:
-        if line.strip() == "":
-            line_no -= 1
-        else:
-            break
-    return line_no
+    return context.lines_index.find_dedent_line_number(
+        previously_processed_line_number, context.indent
+    )
 
 
 def _add_extra_blanks_due_to_previous_statement(
@@ -0,0 +1,34 @@
+"""
+Remembers GDScript code which is known to be a fixed point of format_code,
+so that already formatted files can be skipped without parsing.
+"""
+from typing import Optional
+
+from ..common.cache import ArtifactStore
+
+ARTIFACT_KIND = "gdformat"
+
+
+class FormattingCache:
+    """Set of code left unchanged by format_code, kept in the artifact store
+    separately for each max line length.
+    """
+
+    def __init__(self, max_line_length: int, cache_dirpath: Optional[str] = None):
+        self._max_line_length = max_line_length
+        self._store = ArtifactStore(cache_dirpath)
+
+    def contains(self, code: str) -> bool:
+        """Returns True if code is known to be left unchanged by the formatter"""
+        return (
+            self._store.get(ARTIFACT_KIND, code, options=self._max_line_length)
+            is not None
+        )
+
+    def add(self, code: str) -> None:
+        """Records code as left unchanged by the formatter"""
+        self._store.put(ARTIFACT_KIND, code, True, options=self._max_line_length)
+
+    def save(self) -> None:
+        """Keeps the store within its size cap, failing to do so is not an error"""
+        self._store.save()
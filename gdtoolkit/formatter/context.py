@@ -1,48 +1,157 @@
-from typing import List, Optional
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, FrozenSet, List, Optional
 from dataclasses import dataclass
 import re
 
 from .constants import INDENT_STRING, INDENT_SIZE
+from .expression_utils import ExpressionAnnotations
+from .expression_to_str import ExpressionStrings
 
 
-# pylint: disable=too-many-arguments
 # pylint: disable=too-many-instance-attributes
-class Context:
+class FileContext:
+    """Per-file data shared by all contexts of a single formatting run"""
+
+    # pylint: disable=too-many-arguments
     def __init__(
         self,
-        indent: int,
-        previously_processed_line_number: int,
-        max_line_length: int,
         gdscript_code_lines: List[str],
         standalone_comments: List[Optional[str]],
         inline_comments: List[Optional[str]],
+        verbatim_lines: FrozenSet[int] = frozenset(),
+        lines_to_format: Optional[FrozenSet[int]] = None,
     ):
-        self.indent = indent
-        self.previously_processed_line_number = previously_processed_line_number
-        self.max_line_length = max_line_length
         self.gdscript_code_lines = gdscript_code_lines
+        self.verbatim_lines = verbatim_lines
+        self.lines_index = LinesIndex(gdscript_code_lines)
+        # If set, only statements intersecting those lines are formatted
+        self.lines_to_format = lines_to_format
         # Build ignore mask from standalone gdformat tags and null out comments
         # in ignored regions so postprocessing won't inject/move them.
-        self.ignore_mask = _build_ignore_mask(self.gdscript_code_lines)
+        # Lines requested to be kept verbatim are treated as ignored as well.
+        self.ignore_mask = _build_ignore_mask(
+            self.gdscript_code_lines, self.verbatim_lines
+        )
+        # ignored_lines_before[i] is a number of ignored lines in [0, i)
+        self._ignored_lines_before = [0] + list(accumulate(self.ignore_mask))
+        # Comments of lines emitted verbatim are nulled out while formatting.
         self.standalone_comments = _null_comments_in_ignored_regions(
             standalone_comments, self.ignore_mask
         )
         self.inline_comments = _null_comments_in_ignored_regions(
             inline_comments, self.ignore_mask
         )
+        self.expression_annotations = ExpressionAnnotations(self.standalone_comments)
+        self.expression_strings = ExpressionStrings()
+
+    def has_ignored_lines(self, begin: int, end: int) -> bool:
+        """Checks if any line in [begin, end] is ignored"""
+        if end < begin:
+            return False
+        return (
+            self._ignored_lines_before[end + 1] - self._ignored_lines_before[begin] > 0
+        )
+
+
+class Context:
+    def __init__(
+        self,
+        indent: int,
+        previously_processed_line_number: int,
+        max_line_length: int,
+        file_context: FileContext,
+    ):
+        self.indent = indent
+        self.previously_processed_line_number = previously_processed_line_number
+        self.max_line_length = max_line_length
+        self.file_context = file_context
         self.indent_string = INDENT_STRING * (self.indent // INDENT_SIZE)
 
+    @property
+    def gdscript_code_lines(self) -> List[str]:
+        return self.file_context.gdscript_code_lines
+
+    @property
+    def standalone_comments(self) -> List[Optional[str]]:
+        return self.file_context.standalone_comments
+
+    @property
+    def inline_comments(self) -> List[Optional[str]]:
+        return self.file_context.inline_comments
+
+    @property
+    def lines_to_format(self) -> Optional[FrozenSet[int]]:
+        return self.file_context.lines_to_format
+
+    @property
+    def lines_index(self) -> "LinesIndex":
+        return self.file_context.lines_index
+
+    @property
+    def expression_annotations(self) -> ExpressionAnnotations:
+        return self.file_context.expression_annotations
+
+    @property
+    def expression_strings(self) -> ExpressionStrings:
+        return self.file_context.expression_strings
+
+    def has_ignored_lines(self, begin: int, end: int) -> bool:
+        return self.file_context.has_ignored_lines(begin, end)
+
     def create_child_context(self, previously_processed_line_number: int):
         return Context(
             indent=self.indent + INDENT_SIZE,
             previously_processed_line_number=previously_processed_line_number,
             max_line_length=self.max_line_length,
-            gdscript_code_lines=self.gdscript_code_lines,
-            standalone_comments=self.standalone_comments,
-            inline_comments=self.inline_comments,
+            file_context=self.file_context,
         )
 
 
+class LinesIndex:
+    """Per-file indentation data built once so that block boundaries
+    can be found without rescanning the code lines.
+    """
+
+    def __init__(self, lines: List[str]):
+        self._lines_num = len(lines)
+        # line numbers of lines which end blocks of indent greater than the key
+        self._dedent_lines = {}  # type: Dict[int, List[int]]
+        # last non-empty and last code (non-empty, non-comment) line up to given line
+        self._last_non_empty_lines = []  # type: List[int]
+        self._last_code_lines = []  # type: List[int]
+        last_non_empty_line = -1
+        last_code_line = -1
+        for line_no, line in enumerate(lines):
+            indent = _indent_width(line)
+            if indent is not None:
+                self._dedent_lines.setdefault(indent, []).append(line_no)
+            stripped = line.strip()
+            if stripped != "":
+                last_non_empty_line = line_no
+                if not stripped.startswith("#"):
+                    last_code_line = line_no
+            self._last_non_empty_lines.append(last_non_empty_line)
+            self._last_code_lines.append(last_code_line)
+
+    def find_dedent_line_number(self, line_number: int, indent: int) -> int:
+        """Returns the first line after the block of given indent continuing after
+        line_number, excluding empty lines preceding it"""
+        dedent_line_number = self._lines_num
+        for line_indent, lines in self._dedent_lines.items():
+            if line_indent >= indent:
+                continue
+            ix = bisect_right(lines, line_number)
+            if ix < len(lines):
+                dedent_line_number = min(dedent_line_number, lines[ix])
+        return self._last_non_empty_lines[dedent_line_number - 1] + 1
+
+    def find_last_code_line(self, begin: int, end: int) -> Optional[int]:
+        """Returns the last non-empty, non-comment line in [begin, end]"""
+        line_number = self._last_code_lines[end]
+        return line_number if line_number >= begin else None
+
+
 # TODO: remove optional from suffix line and align codebase
 @dataclass
 class ExpressionContext:
@@ -56,7 +165,9 @@ class ExpressionContext:
 _GDFORMAT_TAG_RE = re.compile(r"^\s*#\s*gdformat\s*:\s*(off|on)\b", re.IGNORECASE)
 
 
-def _build_ignore_mask(lines: List[str]) -> List[bool]:
+def _build_ignore_mask(
+    lines: List[str], verbatim_lines: FrozenSet[int] = frozenset()
+) -> List[bool]:
     # lines[0] is a synthetic empty line in this codebase's convention. Keep it False.
     ignore_mask = [False] * len(lines)
     in_ignore = False
@@ -64,7 +175,7 @@ def _build_ignore_mask(lines: List[str]) -> List[bool]:
         line = lines[i]
         m = _GDFORMAT_TAG_RE.search(line)
         if m is None:
-            ignore_mask[i] = in_ignore
+            ignore_mask[i] = in_ignore or i in verbatim_lines
             continue
         # Tag lines themselves are preserved verbatim as well
         ignore_mask[i] = True
@@ -73,11 +184,26 @@ def _build_ignore_mask(lines: List[str]) -> List[bool]:
     return ignore_mask
 
 
+def _indent_width(line: str) -> Optional[int]:
+    # Width of the leading run of spaces or tabs (tab counts as a single indent
+    # level), None for lines consisting of such run only (incl. empty lines).
+    if line.startswith(" "):
+        stripped_line = line.lstrip(" ")
+        width = len(line) - len(stripped_line)
+    elif line.startswith("\t"):
+        stripped_line = line.lstrip("\t")
+        width = (len(line) - len(stripped_line)) * INDENT_SIZE
+    else:
+        stripped_line = line
+        width = 0
+    return width if stripped_line != "" else None
+
+
 def _null_comments_in_ignored_regions(
     comments: List[Optional[str]], ignore_mask: List[bool]
 ) -> List[Optional[str]]:
-    # Keep list shape; null out entries where ignore mask is active
-    return [
-        None if (i < len(ignore_mask) and ignore_mask[i]) else comment
-        for i, comment in enumerate(comments)
-    ]
+    # Keep list shape (and identity); null out entries where ignore mask is active
+    for i in range(min(len(comments), len(ignore_mask))):
+        if ignore_mask[i]:
+            comments[i] = None
+    return comments
@@ -0,0 +1,351 @@
+"""
+Line diff producing difflib-compatible opcodes and unified diffs.
+Common prefix and suffix are trimmed first, then the lines unique on both
+sides anchor the diff (like in patience diff) and only the ranges between
+the anchors are diffed with the linear-space variant of Myers' O(ND)
+algorithm. Ranges too big for it (e.g. long, repetitive data arrays without
+unique lines) are left to difflib, which copes with them by ignoring
+frequent lines. Opcodes are produced in order as they are found, so the first
+hunks of a unified diff don't wait for the whole diff.
+"""
+import bisect
+import difflib
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+Opcode = Tuple[str, int, int, int, int]
+# (i, j, size) matching block or (a_begin, a_end, b_begin, b_end) range to diff
+_Task = Union[Tuple[int, int, int], Tuple[int, int, int, int]]
+
+# Like in git, the search for a minimal diff is cut short once the edit cost
+# exceeds the limit, and the furthest reaching path is taken instead.
+MIN_MAX_COST = 256
+# ranges with more lines (on both sides) than that are diffed by difflib
+MYERS_MAX_LINES = 400
+
+
+def get_opcodes(a_lines: Sequence[str], b_lines: Sequence[str]) -> List[Opcode]:
+    """Returns difflib-compatible opcodes turning a_lines into b_lines"""
+    return list(_iter_opcodes(a_lines, b_lines))
+
+
+def unified_diff(
+    a_lines: Sequence[str],
+    b_lines: Sequence[str],
+    from_file: str = "",
+    to_file: str = "",
+    context: int = 3,
+    max_hunks: Optional[int] = None,
+) -> Iterator[str]:
+    """Yields lines of unified diff (without line terminators) hunk by hunk,
+    at most max_hunks hunks are yielded if given"""
+    for hunk_ix, group in enumerate(
+        _group_opcodes(_iter_opcodes(a_lines, b_lines), context)
+    ):
+        if hunk_ix == 0:
+            yield "--- {}".format(from_file)
+            yield "+++ {}".format(to_file)
+        if max_hunks is not None and hunk_ix >= max_hunks:
+            yield "@@ further hunks omitted @@"
+            return
+        first, last = group[0], group[-1]
+        yield "@@ -{} +{} @@".format(
+            _format_range(first[1], last[2]), _format_range(first[3], last[4])
+        )
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a_lines[i1:i2]:
+                    yield " " + line
+                continue
+            for line in a_lines[i1:i2]:
+                yield "-" + line
+            for line in b_lines[j1:j2]:
+                yield "+" + line
+
+
+def _iter_opcodes(a_lines: Sequence[str], b_lines: Sequence[str]) -> Iterator[Opcode]:
+    a, b = _intern(a_lines, b_lines)
+    i = j = 0
+    for match_i, match_j, size in _iter_matching_blocks(a, b):
+        if i < match_i and j < match_j:
+            yield ("replace", i, match_i, j, match_j)
+        elif i < match_i:
+            yield ("delete", i, match_i, j, match_j)
+        elif j < match_j:
+            yield ("insert", i, match_i, j, match_j)
+        if size > 0:
+            yield ("equal", match_i, match_i + size, match_j, match_j + size)
+        i, j = match_i + size, match_j + size
+
+
+def _intern(
+    a_lines: Sequence[str], b_lines: Sequence[str]
+) -> Tuple[List[int], List[int]]:
+    line_ids = {}  # type: Dict[str, int]
+    a = [line_ids.setdefault(line, len(line_ids)) for line in a_lines]
+    b = [line_ids.setdefault(line, len(line_ids)) for line in b_lines]
+    return a, b
+
+
+def _iter_matching_blocks(a: List[int], b: List[int]) -> Iterator[Tuple[int, int, int]]:
+    # Yields difflib-like matching blocks in order, terminated with
+    # (len(a), len(b), 0). The leftmost task is always on top of the stack,
+    # so matches can be yielded as soon as they are popped.
+    tasks = [(0, len(a), 0, len(b))]  # type: List[_Task]
+    block = None  # type: Optional[Tuple[int, int, int]]
+    while len(tasks) > 0:
+        task = tasks.pop()
+        if len(task) == 3:
+            i, j, size = task  # type: ignore
+            if (
+                block is not None
+                and block[0] + block[2] == i
+                and block[1] + block[2] == j
+            ):
+                block = (block[0], block[1], block[2] + size)
+                continue
+            if block is not None:
+                yield block
+            block = (i, j, size)
+            continue
+        tasks += reversed(_split_range(a, b, *task))  # type: ignore
+    if block is not None:
+        yield block
+    yield (len(a), len(b), 0)
+
+
+def _split_range(
+    a: List[int], b: List[int], a_begin: int, a_end: int, b_begin: int, b_end: int
+) -> List[_Task]:
+    # Returns matching blocks and smaller ranges to diff covering the range,
+    # in order
+    prefix = 0
+    while (
+        a_begin + prefix < a_end
+        and b_begin + prefix < b_end
+        and a[a_begin + prefix] == b[b_begin + prefix]
+    ):
+        prefix += 1
+    suffix = 0
+    while (
+        a_begin + prefix < a_end - suffix
+        and b_begin + prefix < b_end - suffix
+        and a[a_end - suffix - 1] == b[b_end - suffix - 1]
+    ):
+        suffix += 1
+    tasks = []  # type: List[_Task]
+    if prefix > 0:
+        tasks.append((a_begin, b_begin, prefix))
+    tasks += _split_middle(
+        a, b, a_begin + prefix, a_end - suffix, b_begin + prefix, b_end - suffix
+    )
+    if suffix > 0:
+        tasks.append((a_end - suffix, b_end - suffix, suffix))
+    return tasks
+
+
+def _split_middle(
+    a: List[int], b: List[int], a_begin: int, a_end: int, b_begin: int, b_end: int
+) -> List[_Task]:
+    if a_begin == a_end or b_begin == b_end:
+        return []
+    anchors = _find_unique_anchors(a, b, a_begin, a_end, b_begin, b_end)
+    if len(anchors) > 0:
+        tasks = []  # type: List[_Task]
+        i, j = a_begin, b_begin
+        for anchor_i, anchor_j in anchors:
+            tasks.append((i, anchor_i, j, anchor_j))
+            tasks.append((anchor_i, anchor_j, 1))
+            i, j = anchor_i + 1, anchor_j + 1
+        tasks.append((i, a_end, j, b_end))
+        return tasks
+    if (a_end - a_begin) + (b_end - b_begin) > MYERS_MAX_LINES:
+        matcher = difflib.SequenceMatcher(None, a[a_begin:a_end], b[b_begin:b_end])
+        return [
+            (a_begin + i, b_begin + j, size)
+            for i, j, size in matcher.get_matching_blocks()
+            if size > 0
+        ]
+    split = _find_middle_snake(a, a_begin, a_end, b, b_begin, b_end)
+    if split is None:
+        return []
+    a_split, b_split = split
+    return [(a_begin, a_split, b_begin, b_split), (a_split, a_end, b_split, b_end)]
+
+
+def _find_unique_anchors(
+    a: List[int], b: List[int], a_begin: int, a_end: int, b_begin: int, b_end: int
+) -> List[Tuple[int, int]]:
+    # Returns the longest increasing sequence of (i, j) pairs of lines
+    # occurring exactly once on both sides
+    counts = {}  # type: Dict[int, List[int]]
+    for i in range(a_begin, a_end):
+        counts.setdefault(a[i], [0, 0, i, -1])[0] += 1
+    for j in range(b_begin, b_end):
+        count = counts.get(b[j])
+        if count is not None:
+            count[1] += 1
+            count[3] = j
+    pairs = sorted(
+        (i, j) for a_count, b_count, i, j in counts.values() if a_count == b_count == 1
+    )
+    # patience sorting on j
+    pile_tops = []  # type: List[int]
+    pile_top_pairs = []  # type: List[int]
+    previous = [-1] * len(pairs)
+    for pair_ix, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(pile_tops, j)
+        if pile > 0:
+            previous[pair_ix] = pile_top_pairs[pile - 1]
+        if pile == len(pile_tops):
+            pile_tops.append(j)
+            pile_top_pairs.append(pair_ix)
+        else:
+            pile_tops[pile] = j
+            pile_top_pairs[pile] = pair_ix
+    anchors = []  # type: List[Tuple[int, int]]
+    pair_ix = pile_top_pairs[-1] if len(pile_top_pairs) > 0 else -1
+    while pair_ix != -1:
+        anchors.append(pairs[pair_ix])
+        pair_ix = previous[pair_ix]
+    anchors.reverse()
+    return anchors
+
+
+# pylint: disable=too-many-arguments,too-many-locals,too-many-branches
+def _find_middle_snake(
+    a: List[int], a_begin: int, a_end: int, b: List[int], b_begin: int, b_end: int
+) -> Optional[Tuple[int, int]]:
+    # Runs Myers' search from both ends at once and returns the point where
+    # the paths overlap, None if sequences have nothing in common.
+    n = a_end - a_begin
+    m = b_end - b_begin
+    max_d = (n + m + 1) // 2
+    max_cost = max(MIN_MAX_COST, int(math.sqrt(n + m)))
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    forward_v = [-1] * v_length
+    forward_v[v_offset + 1] = 0
+    backward_v = [-1] * v_length
+    backward_v[v_offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1_start = k1_end = k2_start = k2_end = 0
+    for d in range(max_d):
+        if d > max_cost:
+            return _find_furthest_reaching_point(
+                forward_v, v_offset, d, n, m, a_begin, b_begin
+            )
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (
+                k1 != d and forward_v[k1_offset - 1] < forward_v[k1_offset + 1]
+            ):
+                x1 = forward_v[k1_offset + 1]
+            else:
+                x1 = forward_v[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a_begin + x1] == b[b_begin + y1]:
+                x1 += 1
+                y1 += 1
+            forward_v[k1_offset] = x1
+            if x1 > n:
+                k1_end += 2
+            elif y1 > m:
+                k1_start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and backward_v[k2_offset] != -1:
+                    if x1 >= n - backward_v[k2_offset]:
+                        return (a_begin + x1, b_begin + y1)
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (
+                k2 != d and backward_v[k2_offset - 1] < backward_v[k2_offset + 1]
+            ):
+                x2 = backward_v[k2_offset + 1]
+            else:
+                x2 = backward_v[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a_end - x2 - 1] == b[b_end - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            backward_v[k2_offset] = x2
+            if x2 > n:
+                k2_end += 2
+            elif y2 > m:
+                k2_start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and forward_v[k1_offset] != -1:
+                    x1 = forward_v[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return (a_begin + x1, b_begin + y1)
+    return None
+
+
+# pylint: disable=too-many-arguments
+def _find_furthest_reaching_point(
+    forward_v: List[int],
+    v_offset: int,
+    d: int,
+    n: int,
+    m: int,
+    a_begin: int,
+    b_begin: int,
+) -> Optional[Tuple[int, int]]:
+    best_point = None
+    best_distance = 0
+    for k in range(-d, d + 1):
+        x = forward_v[v_offset + k]
+        y = x - k
+        if x == -1 or x > n or y < 0 or y > m or (x, y) == (n, m):
+            continue
+        if x + y > best_distance:
+            best_point = (a_begin + x, b_begin + y)
+            best_distance = x + y
+    return best_point
+
+
+def _group_opcodes(opcodes: Iterator[Opcode], context: int) -> Iterator[List[Opcode]]:
+    # Same grouping as difflib.SequenceMatcher.get_grouped_opcodes(),
+    # but opcodes are consumed lazily
+    group = []  # type: List[Opcode]
+    is_first = True
+    for opcode, is_last in _mark_last(opcodes):
+        tag, i1, i2, j1, j2 = opcode
+        if tag == "equal" and is_first:
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        if tag == "equal" and is_last:
+            i2, j2 = min(i2, i1 + context), min(j2, j1 + context)
+        is_first = False
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if len(group) > 0 and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _mark_last(opcodes: Iterator[Opcode]) -> Iterator[Tuple[Opcode, bool]]:
+    previous = None  # type: Optional[Opcode]
+    for opcode in opcodes:
+        if previous is not None:
+            yield previous, False
+        previous = opcode
+    if previous is not None:
+        yield previous, True
+
+
+def _format_range(begin: int, end: int) -> str:
+    # Same as difflib's range format in unified diffs
+    length = end - begin
+    first_line = begin + 1
+    if length == 1:
+        return str(first_line)
+    if length == 0:
+        first_line -= 1
+    return "{},{}".format(first_line, length)
@@ -9,12 +9,10 @@ from .types import Node, Outcome, FormattedLines
 from .expression_utils import (
     remove_outer_parentheses,
     is_foldable,
-    is_expression_forcing_multiple_lines,
     is_any_comma,
     is_trailing_comma,
     has_leading_dot,
 )
-from .expression_to_str import expression_to_str, standalone_expression_to_str
 
 
 def format_expression(
@@ -40,29 +38,37 @@ def format_comma_separated_list(
     fake_meta.line = expression_context.prefix_line
     fake_meta.end_line = expression_context.suffix_line
     fake_expression = Tree("fake", a_list, fake_meta)
-    multiline_mode_forced = is_expression_forcing_multiple_lines(
-        fake_expression, context.standalone_comments
+    multiline_mode_forced = context.expression_annotations.is_forcing_multiple_lines(
+        fake_expression
     )
     if not multiline_mode_forced:
-        strings_to_join = list(map(standalone_expression_to_str, elements))
-        single_line_expression = "{}{}{}".format(
-            expression_context.prefix_string,
-            ", ".join(strings_to_join),
-            expression_context.suffix_string,
+        expression_strings = context.expression_strings
+        separators_width = len(", ") * max(len(elements) - 1, 0)
+        elements_width = (
+            sum(map(expression_strings.standalone_width, elements)) + separators_width
+        )
+        single_line_length = (
+            context.indent
+            + len(expression_context.prefix_string)
+            + elements_width
+            + len(expression_context.suffix_string)
         )
-        single_line_length = len(single_line_expression) + context.indent
         if single_line_length <= context.max_line_length:
+            single_line_expression = "{}{}{}".format(
+                expression_context.prefix_string,
+                ", ".join(map(expression_strings.standalone_to_str, elements)),
+                expression_context.suffix_string,
+            )
             return [
                 (
                     expression_context.prefix_line,
                     "{}{}".format(context.indent_string, single_line_expression),
                 )
             ]
-        indented_single_line_expression = ", ".join(strings_to_join)
-        if (
-            len(indented_single_line_expression) + child_context.indent
-            <= context.max_line_length
-        ):
+        if elements_width + child_context.indent <= context.max_line_length:
+            indented_single_line_expression = ", ".join(
+                map(expression_strings.standalone_to_str, elements)
+            )
             return [
                 (
                     expression_context.prefix_line,
@@ -131,7 +137,7 @@ def _format_concrete_expression(
                 "{}{}{}{}".format(
                     context.indent_string,
                     expression_context.prefix_string,
-                    expression_to_str(expression),
+                    context.expression_strings.to_str(expression),
                     expression_context.suffix_string,
                 ),
             )
@@ -143,22 +149,21 @@ def _format_concrete_expression(
 def _format_foldable(
     expression: Node, expression_context: ExpressionContext, context: Context
 ) -> Outcome:
-    if is_expression_forcing_multiple_lines(expression, context.standalone_comments):
+    if context.expression_annotations.is_forcing_multiple_lines(expression):
         return _format_foldable_to_multiple_lines(
             expression, expression_context, context
         )
-    single_line_expression = expression_to_str(expression)
     single_line_length = (
         context.indent
         + len(expression_context.prefix_string)
-        + len(single_line_expression)
+        + context.expression_strings.width(expression)
         + len(expression_context.suffix_string)
     )
     if single_line_length <= context.max_line_length:
         single_line = "{}{}{}{}".format(
             context.indent_string,
             expression_context.prefix_string,
-            expression_to_str(expression),
+            context.expression_strings.to_str(expression),
             expression_context.suffix_string,
         )
         return (
@@ -325,8 +330,8 @@ def _format_assignment_expression_to_multiline_line(
     new_expression_context = ExpressionContext(
         "{}{} {} ".format(
             expression_context.prefix_string,
-            expression_to_str(expression.children[0]),
-            expression_to_str(expression.children[1]),
+            context.expression_strings.to_str(expression.children[0]),
+            context.expression_strings.to_str(expression.children[1]),
         ),
         expression_context.prefix_line,
         expression_context.suffix_string,
@@ -348,7 +353,10 @@ def _format_func_arg_to_multiple_lines(
             [
                 (
                     expression.children[1].line,
-                    "{}{}".format(context.indent_string, expression_to_str(expression)),
+                    "{}{}".format(
+                        context.indent_string,
+                        context.expression_strings.to_str(expression),
+                    ),
                 )
             ],
             expression.children[1].line,
@@ -372,7 +380,7 @@ def _format_call_expression_to_multiline_line(
     dot = "." if has_leading_dot(expression) else ""
     offset = 1 if has_leading_dot(expression) else 0
     callee_node = expression.children[0 + offset]
-    callee = expression_to_str(callee_node)
+    callee = context.expression_strings.to_str(callee_node)
     list_is_empty = len(expression.children) == 3 + offset
     if list_is_empty:
         return (
@@ -487,7 +495,7 @@ def _append_to_expression_context_and_pass(
     expression_context: ExpressionContext,
     context: Context,
 ) -> Outcome:
-    str_to_append = expression_to_str(expression.children[0])
+    str_to_append = context.expression_strings.to_str(expression.children[0])
     new_expression_context = ExpressionContext(
         "{}{}{}".format(expression_context.prefix_string, str_to_append, spacing),
         expression_context.prefix_line,
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Callable, Dict, List, Tuple
 
 from lark import Tree, Token
 
@@ -18,6 +18,40 @@ def standalone_expression_to_str(expression: Node) -> str:
 
 
 def expression_to_str(expression: Node) -> str:
+    return _expression_to_str(expression, expression_to_str)
+
+
+class ExpressionStrings:
+    """Cache of single-line renderings of expressions for a single formatting run.
+    Renderings of subexpressions are reused, so rendering a node at every
+    nesting level while searching for a layout stays linear.
+    """
+
+    def __init__(self):
+        # nodes are kept alongside strings so that their ids are not reused
+        self._strings = {}  # type: Dict[int, Tuple[Node, str]]
+
+    def to_str(self, expression: Node) -> str:
+        if isinstance(expression, Token):
+            return _expression_to_str(expression, self.to_str)
+        cached = self._strings.get(id(expression))
+        if cached is not None:
+            return cached[1]
+        string = _expression_to_str(expression, self.to_str)
+        self._strings[id(expression)] = (expression, string)
+        return string
+
+    def standalone_to_str(self, expression: Node) -> str:
+        return self.to_str(remove_outer_parentheses(expression))
+
+    def width(self, expression: Node) -> int:
+        return len(self.to_str(expression))
+
+    def standalone_width(self, expression: Node) -> int:
+        return len(self.standalone_to_str(expression))
+
+
+def _expression_to_str(expression: Node, to_str: Callable[[Node], str]) -> str:
     if isinstance(expression, Token):
         token_handlers = {
             "LONG_STRING": _long_string_to_str,
@@ -26,109 +60,26 @@ def expression_to_str(expression: Node) -> str:
         if expression.type in token_handlers:
             return token_handlers[expression.type](expression)
         return expression.value
-    return {
-        "expr": lambda e: standalone_expression_to_str(e.children[0]),
-        "assnmnt_expr": _operator_chain_based_expression_to_str,
-        "test_expr": _operator_chain_based_expression_to_str,
-        "or_test": _operator_chain_based_expression_to_str,
-        "and_test": _operator_chain_based_expression_to_str,
-        "not_test": lambda e: "{}{}{}".format(
-            expression_to_str(e.children[0]),
-            "" if e.children[0].value == "!" else " ",
-            expression_to_str(e.children[1]),
-        ),
-        "content_test": _operator_chain_based_expression_to_str,
-        "comparison": _operator_chain_based_expression_to_str,
-        "bitw_or": _operator_chain_based_expression_to_str,
-        "bitw_xor": _operator_chain_based_expression_to_str,
-        "bitw_and": _operator_chain_based_expression_to_str,
-        "shift_expr": _operator_chain_based_expression_to_str,
-        "arith_expr": _operator_chain_based_expression_to_str,
-        "mdr_expr": _operator_chain_based_expression_to_str,
-        "neg_expr": lambda e: "-{}".format(expression_to_str(e.children[1])),
-        "bitw_not": lambda e: "~{}".format(expression_to_str(e.children[1])),
-        "type_test": _operator_chain_based_expression_to_str,
-        "type_cast": _operator_chain_based_expression_to_str,
-        "standalone_call": _standalone_call_to_str,
-        "getattr_call": _getattr_call_to_str,
-        "getattr": lambda e: "".join(map(expression_to_str, e.children)),
-        "subscr_expr": _subscription_to_str,
-        "par_expr": lambda e: "({})".format(
-            standalone_expression_to_str(e.children[0])
-        ),
-        "array": _array_to_str,
-        "dict": _dict_to_str,
-        "kv_pair": lambda e: _dict_element_to_str(e.children[0]),
-        "c_dict_element": _dict_element_to_str,
-        "eq_dict_element": _dict_element_to_str,
-        "string": lambda e: expression_to_str(e.children[0]),
-        "node_path": lambda e: "@{}".format(expression_to_str(e.children[0])),
-        "get_node": lambda e: "${}".format(expression_to_str(e.children[0])),
-        "path": lambda e: "/".join([name_token.value for name_token in e.children]),
-        # fake expressions:
-        "func_arg_regular": lambda e: "{}{}".format(
-            e.children[0].value,
-            " = {}".format(standalone_expression_to_str(e.children[1]))
-            if len(e.children) > 1
-            else "",
-        ),
-        "func_arg_inf": lambda e: "{} := {}".format(
-            e.children[0].value, standalone_expression_to_str(e.children[1])
-        ),
-        "func_arg_typed": lambda e: "{}: {}{}".format(
-            e.children[0].value,
-            e.children[1].value,
-            " = {}".format(standalone_expression_to_str(e.children[2]))
-            if len(e.children) > 2
-            else "",
-        ),
-        "trailing_comma": lambda _: "",
-        # patterns (fake expressions):
-        "list_pattern": lambda e: ", ".join(map(expression_to_str, e.children)),
-        "test_pattern": _operator_chain_based_expression_to_str,
-        "or_pattern": _operator_chain_based_expression_to_str,
-        "and_pattern": _operator_chain_based_expression_to_str,
-        "not_pattern": lambda e: "{}{}{}".format(
-            expression_to_str(e.children[0]),
-            "" if e.children[0].value == "!" else " ",
-            expression_to_str(e.children[1]),
-        ),
-        "comp_pattern": _operator_chain_based_expression_to_str,
-        "bitw_or_pattern": _operator_chain_based_expression_to_str,
-        "bitw_xor_pattern": _operator_chain_based_expression_to_str,
-        "bitw_and_pattern": _operator_chain_based_expression_to_str,
-        "shift_pattern": _operator_chain_based_expression_to_str,
-        "arith_pattern": _operator_chain_based_expression_to_str,
-        "mdr_pattern": _operator_chain_based_expression_to_str,
-        "neg_pattern": lambda e: "-{}".format(expression_to_str(e.children[1])),
-        "bitw_not_pattern": lambda e: "~{}".format(expression_to_str(e.children[1])),
-        "attr_pattern": lambda e: ".".join(map(expression_to_str, e.children[::2])),
-        "call_pattern": lambda e: "{}({})".format(
-            expression_to_str(e.children[0]), expression_to_str(e.children[1])
-        ),
-        "par_pattern": lambda e: "({})".format(expression_to_str(e.children[0])),
-        "var_capture_pattern": lambda e: "var {}".format(
-            expression_to_str(e.children[0])
-        ),
-        "etc_pattern": lambda _: "..",
-        "wildcard_pattern": lambda _: "_",
-        "array_pattern": _array_to_str,
-        "dict_pattern": _dict_to_str,
-        "kv_pair_pattern": lambda e: _dict_element_to_str(e.children[0]),
-    }[expression.data](expression)
-
-
-def _operator_chain_based_expression_to_str(expression: Tree) -> str:
+    return _TREE_HANDLERS[expression.data](expression, to_str)
+
+
+def _standalone(to_str: Callable[[Node], str], expression: Node) -> str:
+    return to_str(remove_outer_parentheses(expression))
+
+
+def _operator_chain_based_expression_to_str(
+    expression: Tree, to_str: Callable[[Node], str]
+) -> str:
     operator_expr_chain = zip(expression.children[1::2], expression.children[2::2])
     chain = [
-        " {} {}".format(expression_to_str(operator), expression_to_str(expr))
+        " {} {}".format(to_str(operator), to_str(expr))
         for operator, expr in operator_expr_chain
     ]
     first_expr = expression.children[0]
-    return "{}{}".format(expression_to_str(first_expr), "".join(chain))
+    return "{}{}".format(to_str(first_expr), "".join(chain))
 
 
-def _standalone_call_to_str(call: Tree) -> str:
+def _standalone_call_to_str(call: Tree, to_str: Callable[[Node], str]) -> str:
     is_super_call = False
     offset = 0
     if has_leading_dot(call):
@@ -136,30 +87,30 @@ def _standalone_call_to_str(call: Tree) -> str:
         offset = 1
 
     super_prefix = "." if is_super_call else ""
-    callee = expression_to_str(call.children[0 + offset])
-    arguments = _arguments_to_str(call.children[1 + offset :])
+    callee = to_str(call.children[0 + offset])
+    arguments = _arguments_to_str(call.children[1 + offset :], to_str)
     return "{}{}({})".format(super_prefix, callee, arguments)
 
 
-def _getattr_call_to_str(call: Tree) -> str:
-    a_getattr = expression_to_str(call.children[0])
-    arguments = _arguments_to_str(call.children[1:])
+def _getattr_call_to_str(call: Tree, to_str: Callable[[Node], str]) -> str:
+    a_getattr = to_str(call.children[0])
+    arguments = _arguments_to_str(call.children[1:], to_str)
     return "{}({})".format(a_getattr, arguments)
 
 
-def _arguments_to_str(arguments: List[Node]) -> str:
+def _arguments_to_str(arguments: List[Node], to_str: Callable[[Node], str]) -> str:
     return ", ".join(
         [
-            standalone_expression_to_str(argument)
+            _standalone(to_str, argument)
             for argument in arguments
             if not is_any_parentheses(argument) and not is_any_comma(argument)
         ]
     )
 
 
-def _array_to_str(array: Tree) -> str:
+def _array_to_str(array: Tree, to_str: Callable[[Node], str]) -> str:
     elements = [
-        standalone_expression_to_str(child)
+        _standalone(to_str, child)
         for child in array.children
         if not is_any_comma(child)
     ]
@@ -167,26 +118,108 @@ def _array_to_str(array: Tree) -> str:
     return "[{}{}]".format(", ".join(elements), trailing_comma)
 
 
-def _dict_to_str(a_dict: Tree) -> str:
-    elements = map(expression_to_str, a_dict.children)
+def _dict_to_str(a_dict: Tree, to_str: Callable[[Node], str]) -> str:
+    elements = map(to_str, a_dict.children)
     return "{{{}}}".format(", ".join(elements))
 
 
-def _subscription_to_str(subscription: Tree) -> str:
+def _subscription_to_str(subscription: Tree, to_str: Callable[[Node], str]) -> str:
     return "{}[{}]".format(
-        expression_to_str(subscription.children[0]),
-        standalone_expression_to_str(subscription.children[1]),
+        to_str(subscription.children[0]),
+        _standalone(to_str, subscription.children[1]),
     )
 
 
-def _dict_element_to_str(dict_element: Tree) -> str:
+def _dict_element_to_str(dict_element: Tree, to_str: Callable[[Node], str]) -> str:
     template = "{}: {}" if dict_element.data.startswith("c_dict_") else "{} = {}"
     return template.format(
-        standalone_expression_to_str(dict_element.children[0]),
-        standalone_expression_to_str(dict_element.children[1]),
+        _standalone(to_str, dict_element.children[0]),
+        _standalone(to_str, dict_element.children[1]),
     )
 
 
+_TREE_HANDLERS = {
+    "expr": lambda e, s: _standalone(s, e.children[0]),
+    "assnmnt_expr": _operator_chain_based_expression_to_str,
+    "test_expr": _operator_chain_based_expression_to_str,
+    "or_test": _operator_chain_based_expression_to_str,
+    "and_test": _operator_chain_based_expression_to_str,
+    "not_test": lambda e, s: "{}{}{}".format(
+        s(e.children[0]),
+        "" if e.children[0].value == "!" else " ",
+        s(e.children[1]),
+    ),
+    "content_test": _operator_chain_based_expression_to_str,
+    "comparison": _operator_chain_based_expression_to_str,
+    "bitw_or": _operator_chain_based_expression_to_str,
+    "bitw_xor": _operator_chain_based_expression_to_str,
+    "bitw_and": _operator_chain_based_expression_to_str,
+    "shift_expr": _operator_chain_based_expression_to_str,
+    "arith_expr": _operator_chain_based_expression_to_str,
+    "mdr_expr": _operator_chain_based_expression_to_str,
+    "neg_expr": lambda e, s: "-{}".format(s(e.children[1])),
+    "bitw_not": lambda e, s: "~{}".format(s(e.children[1])),
+    "type_test": _operator_chain_based_expression_to_str,
+    "type_cast": _operator_chain_based_expression_to_str,
+    "standalone_call": _standalone_call_to_str,
+    "getattr_call": _getattr_call_to_str,
+    "getattr": lambda e, s: "".join(map(s, e.children)),
+    "subscr_expr": _subscription_to_str,
+    "par_expr": lambda e, s: "({})".format(_standalone(s, e.children[0])),
+    "array": _array_to_str,
+    "dict": _dict_to_str,
+    "kv_pair": lambda e, s: _dict_element_to_str(e.children[0], s),
+    "c_dict_element": _dict_element_to_str,
+    "eq_dict_element": _dict_element_to_str,
+    "string": lambda e, s: s(e.children[0]),
+    "node_path": lambda e, s: "@{}".format(s(e.children[0])),
+    "get_node": lambda e, s: "${}".format(s(e.children[0])),
+    "path": lambda e, s: "/".join([name_token.value for name_token in e.children]),
+    # fake expressions:
+    "func_arg_regular": lambda e, s: "{}{}".format(
+        e.children[0].value,
+        " = {}".format(_standalone(s, e.children[1])) if len(e.children) > 1 else "",
+    ),
+    "func_arg_inf": lambda e, s: "{} := {}".format(
+        e.children[0].value, _standalone(s, e.children[1])
+    ),
+    "func_arg_typed": lambda e, s: "{}: {}{}".format(
+        e.children[0].value,
+        e.children[1].value,
+        " = {}".format(_standalone(s, e.children[2])) if len(e.children) > 2 else "",
+    ),
+    "trailing_comma": lambda _, __: "",
+    # patterns (fake expressions):
+    "list_pattern": lambda e, s: ", ".join(map(s, e.children)),
+    "test_pattern": _operator_chain_based_expression_to_str,
+    "or_pattern": _operator_chain_based_expression_to_str,
+    "and_pattern": _operator_chain_based_expression_to_str,
+    "not_pattern": lambda e, s: "{}{}{}".format(
+        s(e.children[0]),
+        "" if e.children[0].value == "!" else " ",
+        s(e.children[1]),
+    ),
+    "comp_pattern": _operator_chain_based_expression_to_str,
+    "bitw_or_pattern": _operator_chain_based_expression_to_str,
+    "bitw_xor_pattern": _operator_chain_based_expression_to_str,
+    "bitw_and_pattern": _operator_chain_based_expression_to_str,
+    "shift_pattern": _operator_chain_based_expression_to_str,
+    "arith_pattern": _operator_chain_based_expression_to_str,
+    "mdr_pattern": _operator_chain_based_expression_to_str,
+    "neg_pattern": lambda e, s: "-{}".format(s(e.children[1])),
+    "bitw_not_pattern": lambda e, s: "~{}".format(s(e.children[1])),
+    "attr_pattern": lambda e, s: ".".join(map(s, e.children[::2])),
+    "call_pattern": lambda e, s: "{}({})".format(s(e.children[0]), s(e.children[1])),
+    "par_pattern": lambda e, s: "({})".format(s(e.children[0])),
+    "var_capture_pattern": lambda e, s: "var {}".format(s(e.children[0])),
+    "etc_pattern": lambda _, __: "..",
+    "wildcard_pattern": lambda _, __: "_",
+    "array_pattern": _array_to_str,
+    "dict_pattern": _dict_to_str,
+    "kv_pair_pattern": lambda e, s: _dict_element_to_str(e.children[0], s),
+}  # type: Dict[str, Callable[[Tree, Callable[[Node], str]], str]]
+
+
 def _long_string_to_str(string: Token) -> str:
     actual_string = string.value
     if actual_string.startswith("'''") and actual_string.endswith("'''"):
@@ -1,4 +1,6 @@
-from typing import List, Optional
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
 
 from lark import Tree, Token
 
@@ -40,21 +42,71 @@ def is_trailing_comma(expression: Node) -> bool:
     return isinstance(expression, Tree) and expression.data == "trailing_comma"
 
 
-def is_expression_forcing_multiple_lines(
-    expression: Node, standalone_comments: List[Optional[str]]
-) -> bool:
-    if has_trailing_comma(expression):
-        return True
-    if _is_multiline_string(expression):
-        return True
-    if isinstance(expression, Token):
-        return False
-    if _has_standalone_comments(expression, standalone_comments):
-        return True
-    for child in expression.children:
-        if is_expression_forcing_multiple_lines(child, standalone_comments):
-            return True
-    return False
+@dataclass
+class ExpressionAnnotation:
+    has_trailing_comma: bool
+    has_standalone_comments: bool
+    is_forcing_multiple_lines: bool
+
+
+class ExpressionAnnotations:
+    """Lazily computed per-node flags of expression subtrees.
+    The first query about a node annotates its entire subtree in a single
+    bottom-up pass so that subsequent queries at any nesting level are O(1).
+    """
+
+    def __init__(self, standalone_comments: List[Optional[str]]):
+        # comments_before[i] is a number of standalone comments in lines [0, i)
+        self._comments_before = [0] + list(
+            accumulate(
+                1 if comment is not None else 0 for comment in standalone_comments
+            )
+        )
+        # nodes are kept alongside annotations so that their ids are not reused
+        self._annotations = {}  # type: Dict[int, Tuple[Node, ExpressionAnnotation]]
+
+    def is_forcing_multiple_lines(self, expression: Node) -> bool:
+        return self.annotate(expression).is_forcing_multiple_lines
+
+    def has_standalone_comments(self, expression: Node) -> bool:
+        return self.annotate(expression).has_standalone_comments
+
+    def annotate(self, expression: Node) -> ExpressionAnnotation:
+        if isinstance(expression, Token):
+            return _TOKEN_ANNOTATION
+        cached = self._annotations.get(id(expression))
+        if cached is not None:
+            return cached[1]
+        children_forcing_multiple_lines = [
+            self.annotate(child).is_forcing_multiple_lines
+            for child in expression.children
+        ]
+        trailing_comma = has_trailing_comma(expression)
+        standalone_comments = self._has_standalone_comments(expression)
+        annotation = ExpressionAnnotation(
+            has_trailing_comma=trailing_comma,
+            has_standalone_comments=standalone_comments,
+            is_forcing_multiple_lines=trailing_comma
+            or _is_multiline_string(expression)
+            or standalone_comments
+            or any(children_forcing_multiple_lines),
+        )
+        self._annotations[id(expression)] = (expression, annotation)
+        return annotation
+
+    def _has_standalone_comments(self, expression: Tree) -> bool:
+        assert expression.end_line is not None  # TODO: remove once non-optional anymore
+        last_ix = len(self._comments_before) - 1
+        begin = min(expression.line, last_ix)
+        end = min(max(expression.end_line, begin), last_ix)
+        return self._comments_before[end] - self._comments_before[begin] > 0
+
+
+_TOKEN_ANNOTATION = ExpressionAnnotation(
+    has_trailing_comma=False,
+    has_standalone_comments=False,
+    is_forcing_multiple_lines=False,
+)
 
 
 def is_any_comma(expression: Node) -> bool:
@@ -81,13 +133,3 @@ def _is_multiline_string(expression: Node) -> bool:
         and expression.children[0].type == "LONG_STRING"
         and len(expression.children[0].value.splitlines()) > 1
     )
-
-
-def _has_standalone_comments(
-    expression: Tree, standalone_comments: List[Optional[str]]
-):
-    assert expression.end_line is not None  # TODO: remove once non-optional anymore
-    return any(
-        comment is not None
-        for comment in standalone_comments[expression.line : expression.end_line]
-    )
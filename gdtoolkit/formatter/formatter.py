@@ -1,10 +1,11 @@
 import re
-from typing import List, Optional
+from typing import FrozenSet, List, Optional, Tuple
 
 from lark import Tree
 
+from ..common.tracing import traced
 from ..parser import parser
-from .context import Context
+from .context import Context, FileContext
 from .constants import INLINE_COMMENT_OFFSET, GLOBAL_SCOPE_SURROUNDING_EMPTY_LINES_TABLE
 from .types import FormattedLines
 from .block import format_block
@@ -17,12 +18,21 @@ from .comments import (
 INDENT_REGEX = re.compile(r"^\t+")
 
 
+@traced
 def format_code(
     gdscript_code: str,
     max_line_length: int,
     parse_tree: Optional[Tree] = None,
     comment_parse_tree: Optional[Tree] = None,
+    verbatim_lines: FrozenSet[int] = frozenset(),
+    line_range: Optional[Tuple[int, int]] = None,
+    lines_to_format: Optional[FrozenSet[int]] = None,
 ) -> str:
+    # verbatim_lines are (1-based) line numbers to be treated as if they were
+    # surrounded by '# gdformat: off' and '# gdformat: on' tags,
+    # line_range is an inclusive (1-based) range of lines - if set, only statements
+    # intersecting it are formatted and the rest of code is left as is,
+    # lines_to_format is the same as line_range, but for arbitrary set of lines
     parse_tree = (
         parse_tree
         if parse_tree is not None
@@ -38,15 +48,25 @@ def format_code(
         *gdscript_code.splitlines(),
     ]  # type: List[str]
     formatted_lines = []  # type: FormattedLines
+    if line_range is not None:
+        lines_to_format = frozenset(
+            range(
+                max(1, line_range[0]), min(line_range[1], len(gdscript_code_lines)) + 1
+            )
+        )
     context = Context(
         indent=0,
         previously_processed_line_number=0,
         max_line_length=max_line_length,
-        gdscript_code_lines=gdscript_code_lines,
-        standalone_comments=gather_standalone_comments(
-            gdscript_code, comment_parse_tree
+        file_context=FileContext(
+            gdscript_code_lines=gdscript_code_lines,
+            standalone_comments=gather_standalone_comments(
+                gdscript_code, comment_parse_tree
+            ),
+            inline_comments=gather_inline_comments(gdscript_code, comment_parse_tree),
+            verbatim_lines=verbatim_lines,
+            lines_to_format=lines_to_format,
         ),
-        inline_comments=gather_inline_comments(gdscript_code, comment_parse_tree),
     )
     formatted_lines, _ = format_block(
         parse_tree.children,
@@ -54,73 +74,94 @@ def format_code(
         context,
         GLOBAL_SCOPE_SURROUNDING_EMPTY_LINES_TABLE,
     )
-    formatted_lines.append((None, ""))
+    if (
+        lines_to_format is None
+        or gdscript_code.endswith("\n")
+        or len(gdscript_code_lines) - 1 in lines_to_format
+    ):
+        formatted_lines.append((None, ""))
     formatted_lines = _add_inline_comments(formatted_lines, context.inline_comments)
     formatted_lines = _add_standalone_comments(
         formatted_lines, context.standalone_comments
     )
-    return "\n".join([line for _, line in formatted_lines])
+    return "\n".join(line for _, line in formatted_lines)
 
 
 def _add_inline_comments(
     formatted_lines: FormattedLines, comments: List[Optional[str]]
 ) -> FormattedLines:
-    remaining_comments = comments[:]
-    postprocessed_lines = []  # type: FormattedLines
+    # Each line takes comments starting at its line number up to the
+    # smallest line number of the lines which follow it.
+    postprocessed_lines = formatted_lines[:]
     comment_offset = " " * INLINE_COMMENT_OFFSET
+    remaining_comments_end = len(comments)
 
-    for line_no, line in reversed(formatted_lines):
+    for i in range(len(formatted_lines) - 1, -1, -1):
+        line_no, line = formatted_lines[i]
         if line_no is None:
-            postprocessed_lines.append((line_no, line))
             continue
-        comments = remaining_comments[line_no:]
-        remaining_comments = remaining_comments[:line_no]
-        if comments != []:
-            new_line = comment_offset.join(
-                [line] + [c for c in comments if c is not None]
+        # slice semantics are kept as fake line numbers may be negative
+        begin, end, _ = slice(line_no, None).indices(remaining_comments_end)
+        line_comments = []  # type: List[str]
+        for comment_line_no in range(begin, end):
+            comment = comments[comment_line_no]
+            if comment is not None:
+                line_comments.append(comment)
+        remaining_comments_end = begin
+        if len(line_comments) > 0:
+            postprocessed_lines[i] = (
+                line_no,
+                comment_offset.join([line] + line_comments),
             )
-            postprocessed_lines.append((line_no, new_line))
-        else:
-            postprocessed_lines.append((line_no, line))
 
-    return list(reversed(postprocessed_lines))
+    return postprocessed_lines
 
 
 def _add_standalone_comments(
     formatted_lines: FormattedLines, standalone_comments: List[Optional[str]]
 ) -> FormattedLines:
-    remaining_comments = standalone_comments[:]
+    comment_ranges = _find_standalone_comment_ranges(
+        formatted_lines, len(standalone_comments)
+    )
     postprocessed_lines = []  # type: FormattedLines
-    currently_inside_expression = False
-    last_experssion_line_no = None
+    for i, (line_no, line) in enumerate(formatted_lines):
+        postprocessed_lines.append((line_no, line))
+        comment_range = comment_ranges[i]
+        if comment_range is None:
+            continue
+        indent = _get_greater_indent(line, formatted_lines[i + 1][1])
+        postprocessed_lines += [
+            (None, f"{indent}{standalone_comments[comment_line_no]}")
+            for comment_line_no in range(*comment_range)
+            if standalone_comments[comment_line_no] is not None
+        ]
+    return postprocessed_lines
 
-    for line_no, line in reversed(formatted_lines):
+
+def _find_standalone_comment_ranges(
+    formatted_lines: FormattedLines, comments_num: int
+) -> List[Optional[Tuple[int, int]]]:
+    # Ranges of comments to be injected after each line. Comments are injected
+    # only between adjacent lines of a single expression (statement) whose line
+    # numbers increase - when line numbers decrease (due to nested constructs),
+    # those comments will be picked up in subsequent adjacent windows.
+    comment_ranges = [None] * len(
+        formatted_lines
+    )  # type: List[Optional[Tuple[int, int]]]
+    remaining_comments_end = comments_num
+    next_line_no = None  # type: Optional[int]
+    for i in range(len(formatted_lines) - 1, -1, -1):
+        line_no = formatted_lines[i][0]
         if line_no is None:
-            postprocessed_lines.append((line_no, line))
-            currently_inside_expression = False
-            continue
-        if not currently_inside_expression:
-            postprocessed_lines.append((line_no, line))
-            currently_inside_expression = True
-            last_experssion_line_no = line_no
+            next_line_no = None
             continue
-        # Only inject comments for monotonically decreasing windows.
-        # When line numbers increase (due to nested constructs), skip this window;
-        # those comments will be picked up in subsequent adjacent windows.
-        if last_experssion_line_no is not None and line_no < last_experssion_line_no:
-            comments = remaining_comments[line_no:last_experssion_line_no]
-            remaining_comments = remaining_comments[:line_no]
-            indent = _get_greater_indent(line, postprocessed_lines[-1][1])
-            postprocessed_lines += [
-                (None, f"{indent}{comment}")
-                for comment in reversed(comments)
-                if comment is not None
-            ]
-        postprocessed_lines.append((line_no, line))
-        # Update the anchor to the current line to consider the next adjacent window
-        last_experssion_line_no = line_no
-
-    return list(reversed(postprocessed_lines))
+        if next_line_no is not None and line_no < next_line_no:
+            # slice semantics are kept as fake line numbers may be negative
+            begin, end, _ = slice(line_no, next_line_no).indices(remaining_comments_end)
+            comment_ranges[i] = (begin, end)
+            remaining_comments_end = begin
+        next_line_no = line_no
+    return comment_ranges
 
 
 def _get_greater_indent(line_a: str, line_b: str):
@@ -1,18 +1,27 @@
-from typing import Optional
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
+from collections import Counter
 import difflib
+import hashlib
+import re
 
 from lark import Tree, Transformer, Token
 
+from ..common.tracing import traced
 from ..parser import parser
 from .formatter import format_code
 from .comments import gather_comments
 from .expression_to_str import expression_to_str
+from .diff import get_opcodes
 from .exceptions import (
     TreeInvariantViolation,
     FormattingStabilityViolation,
     CommentPersistenceViolation,
 )
 
+STATEMENT_REGEX = re.compile(r"(_stmt|_def|_branch)$")
+# inline comments are merged with whitespace in between
+COMMENT_PARTS_SEPARATOR = re.compile(r"\s+(?=#)")
+
 
 class LoosenTreeTransformer(Transformer):
     def par_expr(self, args):  # pylint: disable=R0201
@@ -30,11 +39,110 @@ class LoosenTreeTransformer(Transformer):
         return expression_to_str(string_token)
 
 
+@traced
+def check_formatting_safety(
+    given_code: str,
+    formatted_code: str,
+    max_line_length: int,
+    given_code_parse_tree: Optional[Tree] = None,
+    given_code_comment_parse_tree: Optional[Tree] = None,
+    line_range: Optional[Tuple[int, int]] = None,
+) -> None:
+    if given_code == formatted_code:
+        return
+    given_code_parse_tree = (
+        given_code_parse_tree
+        if given_code_parse_tree is not None
+        else parser.parse(given_code, gather_metadata=True)
+    )
+    formatted_code_parse_tree = parser.parse(formatted_code, gather_metadata=True)
+    formatted_code_comment_parse_tree = parser.parse_comments(formatted_code)
+    # only statements changed by formatting are verified
+    unchanged_statements = find_unchanged_statements(
+        given_code,
+        formatted_code,
+        given_code_parse_tree=given_code_parse_tree,
+        formatted_code_parse_tree=formatted_code_parse_tree,
+    )
+    check_comment_persistence(
+        given_code,
+        formatted_code,
+        given_code_comment_parse_tree=given_code_comment_parse_tree,
+        formatted_code_comment_parse_tree=formatted_code_comment_parse_tree,
+    )
+    check_tree_invariant(
+        given_code,
+        formatted_code,
+        given_code_parse_tree=given_code_parse_tree,
+        formatted_code_parse_tree=formatted_code_parse_tree,
+        unchanged_statements=unchanged_statements,
+    )
+    # if only a range was formatted, formatting the changed lines again must be stable
+    check_formatting_stability(
+        formatted_code,
+        max_line_length,
+        parse_tree=formatted_code_parse_tree,
+        comment_parse_tree=formatted_code_comment_parse_tree,
+        unchanged_statements=unchanged_statements,
+        lines_to_format=find_changed_lines(given_code, formatted_code)
+        if line_range is not None
+        else None,
+    )
+
+
+@traced
+def find_unchanged_statements(
+    given_code: str,
+    formatted_code: str,
+    given_code_parse_tree: Tree,
+    formatted_code_parse_tree: Tree,
+) -> FrozenSet[int]:
+    """Returns indexes of top-level statements which - along with the lines
+    following them up to the next statement - are the same before and after formatting.
+    Both parse trees must come with metadata.
+    """
+    given_statements = given_code_parse_tree.children
+    formatted_statements = formatted_code_parse_tree.children
+    if len(given_statements) != len(formatted_statements):
+        return frozenset()
+    given_code_lines = given_code.splitlines()
+    formatted_code_lines = formatted_code.splitlines()
+    given_ranges = _find_statement_line_ranges(given_statements, len(given_code_lines))
+    formatted_ranges = _find_statement_line_ranges(
+        formatted_statements, len(formatted_code_lines)
+    )
+    return frozenset(
+        i
+        for i, (
+            (given_begin, given_end),
+            (formatted_begin, formatted_end),
+        ) in enumerate(zip(given_ranges, formatted_ranges))
+        if given_code_lines[given_begin - 1 : given_end]
+        == formatted_code_lines[formatted_begin - 1 : formatted_end]
+    )
+
+
+def find_changed_lines(given_code: str, formatted_code: str) -> FrozenSet[int]:
+    """Returns (1-based) numbers of formatted code lines which are not present
+    in the given code (according to line diff)
+    """
+    return frozenset(
+        j + 1
+        for tag, _, _, j1, j2 in get_opcodes(
+            given_code.splitlines(), formatted_code.splitlines()
+        )
+        if tag in ["replace", "insert"]
+        for j in range(j1, j2)
+    )
+
+
+@traced
 def check_tree_invariant(
     given_code: str,
     formatted_code: str,
     given_code_parse_tree: Optional[Tree] = None,
     formatted_code_parse_tree: Optional[Tree] = None,
+    unchanged_statements: FrozenSet[int] = frozenset(),
 ) -> None:
     given_code_parse_tree = (
         given_code_parse_tree
@@ -46,32 +154,73 @@ def check_tree_invariant(
         if formatted_code_parse_tree is not None
         else parser.parse(formatted_code)
     )
+    # unchanged statements are identical in both trees, so they can be skipped
+    given_code_parse_tree = _remove_statements(
+        given_code_parse_tree, unchanged_statements
+    )
+    formatted_code_parse_tree = _remove_statements(
+        formatted_code_parse_tree, unchanged_statements
+    )
     loosen_tree_transformer = LoosenTreeTransformer()
     given_code_parse_tree = loosen_tree_transformer.transform(given_code_parse_tree)
     formatted_code_parse_tree = loosen_tree_transformer.transform(
         formatted_code_parse_tree
     )
-    if given_code_parse_tree != formatted_code_parse_tree:
+    given_code_hashes = {}  # type: Dict[int, bytes]
+    formatted_code_hashes = {}  # type: Dict[int, bytes]
+    if _hash_subtrees(given_code_parse_tree, given_code_hashes) != _hash_subtrees(
+        formatted_code_parse_tree, formatted_code_hashes
+    ):
+        given_subtree, formatted_subtree = _find_smallest_differing_statements(
+            given_code_parse_tree,
+            formatted_code_parse_tree,
+            given_code_hashes,
+            formatted_code_hashes,
+        )
         diff = "\n".join(
             difflib.unified_diff(
-                str(given_code_parse_tree.pretty()).splitlines(),
-                str(formatted_code_parse_tree.pretty()).splitlines(),
+                _subtree_to_str(given_subtree).splitlines(),
+                _subtree_to_str(formatted_subtree).splitlines(),
             )
         )
         raise TreeInvariantViolation(diff)
 
 
+@traced
 def check_formatting_stability(
     formatted_code: str,
     max_line_length: int,
     parse_tree: Optional[Tree] = None,
     comment_parse_tree: Optional[Tree] = None,
+    unchanged_statements: FrozenSet[int] = frozenset(),
+    lines_to_format: Optional[FrozenSet[int]] = None,
 ) -> None:
+    verbatim_lines = frozenset()  # type: FrozenSet[int]
+    if len(unchanged_statements) > 0:
+        # unchanged statements are already known to be stable, therefore
+        # they are kept verbatim and only the remaining ones are formatted again
+        parse_tree = (
+            parse_tree
+            if parse_tree is not None
+            else parser.parse(formatted_code, gather_metadata=True)
+        )
+        statement_line_ranges = _find_statement_line_ranges(
+            parse_tree.children, len(formatted_code.splitlines())
+        )
+        verbatim_lines = frozenset(
+            line
+            for i in unchanged_statements
+            for line in range(
+                statement_line_ranges[i][0], statement_line_ranges[i][1] + 1
+            )
+        )
     code_formatted_again = format_code(
         formatted_code,
         max_line_length,
         parse_tree=parse_tree,
         comment_parse_tree=comment_parse_tree,
+        verbatim_lines=verbatim_lines,
+        lines_to_format=lines_to_format,
     )
     if formatted_code != code_formatted_again:
         diff = "\n".join(
@@ -82,7 +231,7 @@ def check_formatting_stability(
         raise FormattingStabilityViolation(diff)
 
 
-# TODO: boost algorithm
+@traced
 def check_comment_persistence(
     given_code: str,
     formatted_code: str,
@@ -93,9 +242,101 @@ def check_comment_persistence(
     comments_after_formatting = gather_comments(
         formatted_code, formatted_code_comment_parse_tree
     )
-    for original_comment in original_comments:
-        if not any(
-            original_comment in comment_after_formatting
-            for comment_after_formatting in comments_after_formatting
+    # inline comments may get merged into one, so all comments are compared
+    # part by part
+    missing_parts = Counter(_split_comments(original_comments)) - Counter(
+        _split_comments(comments_after_formatting)
+    )
+    if len(missing_parts) > 0:
+        raise CommentPersistenceViolation(next(iter(missing_parts)))
+
+
+def _split_comments(comments: List[str]) -> Iterator[str]:
+    for comment in comments:
+        yield from COMMENT_PARTS_SEPARATOR.split(comment)
+
+
+def _find_statement_line_ranges(
+    statements: List[Tree], lines_num: int
+) -> List[Tuple[int, int]]:
+    """Returns ranges of lines from each statement up to the next one (inclusive)"""
+    begins = [statement.line for statement in statements]
+    ends = [begin - 1 for begin in begins[1:]] + [lines_num]
+    return list(zip(begins, ends))
+
+
+def _remove_statements(parse_tree: Tree, statements_to_remove: FrozenSet[int]) -> Tree:
+    if len(statements_to_remove) == 0:
+        return parse_tree
+    return Tree(
+        parse_tree.data,
+        [
+            statement
+            for i, statement in enumerate(parse_tree.children)
+            if i not in statements_to_remove
+        ],
+    )
+
+
+def _hash_subtrees(node: Any, hashes: Dict[int, bytes]) -> bytes:
+    """Computes Merkle-style hashes of all subtrees in a single pass,
+    stores them in hashes (by node id) and returns the hash of the whole tree.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(node, Tree):
+        digest.update(b"T" + node.data.encode("utf-8") + b"\0")
+        for child in node.children:
+            digest.update(_hash_subtrees(child, hashes))
+    elif isinstance(node, Token):
+        digest.update(b"K" + node.type.encode("utf-8") + b"\0")
+        digest.update(node.value.encode("utf-8"))
+    elif isinstance(node, str):
+        digest.update(b"S" + node.encode("utf-8"))
+    elif isinstance(node, list):
+        digest.update(b"L")
+        for child in node:
+            digest.update(_hash_subtrees(child, hashes))
+    else:
+        digest.update(b"R" + repr(node).encode("utf-8"))
+    hashes[id(node)] = digest.digest()
+    return hashes[id(node)]
+
+
+def _find_smallest_differing_statements(
+    given_node: Tree,
+    formatted_node: Tree,
+    given_hashes: Dict[int, bytes],
+    formatted_hashes: Dict[int, bytes],
+) -> Tuple[Tree, Tree]:
+    """Descends both trees as long as exactly one child differs and returns
+    the deepest pair of differing statements (or roots if there are none).
+    """
+    differing_statements = (given_node, formatted_node)
+    while (
+        isinstance(given_node, Tree)
+        and isinstance(formatted_node, Tree)
+        and given_node.data == formatted_node.data
+        and len(given_node.children) == len(formatted_node.children)
+    ):
+        differing_children = [
+            (given_child, formatted_child)
+            for given_child, formatted_child in zip(
+                given_node.children, formatted_node.children
+            )
+            if given_hashes[id(given_child)] != formatted_hashes[id(formatted_child)]
+        ]
+        if len(differing_children) != 1:
+            break
+        given_node, formatted_node = differing_children[0]
+        if (
+            isinstance(given_node, Tree)
+            and isinstance(formatted_node, Tree)
+            and STATEMENT_REGEX.search(given_node.data) is not None
+            and STATEMENT_REGEX.search(formatted_node.data) is not None
         ):
-            raise CommentPersistenceViolation(original_comment)
+            differing_statements = (given_node, formatted_node)
+    return differing_statements
+
+
+def _subtree_to_str(node: Any) -> str:
+    return str(node.pretty()) if isinstance(node, Tree) else str(node)
@@ -9,6 +9,7 @@ Usage:
   gd2py <path> [options]
 
 Options:
+  --trace=<file>             Write Chrome trace of the run to the file.
   -h --help                  Show this screen.
   --version                  Show version.
 
@@ -20,12 +21,18 @@ import sys
 
 from docopt import docopt
 
-from . import convert_code
+from gdtoolkit.common.tracing import enable_tracing, file_span, span
 from gdtoolkit.common.version import get_gdtoolkit_version
 
 
 def main():
     sys.stdout.reconfigure(encoding="utf-8")
     arguments = docopt(__doc__, version="gd2py {}".format(get_gdtoolkit_version()))
-    with open(arguments["<path>"], "r", encoding="utf-8") as fh:
-        print(convert_code(fh.read()))
+    enable_tracing(arguments["--trace"])
+    from . import convert_code  # pylint: disable=import-outside-toplevel
+
+    with file_span(arguments["<path>"]):
+        with span("read"), open(arguments["<path>"], "r", encoding="utf-8") as fh:
+            code = fh.read()
+        with span("convert"):
+            print(convert_code(code))
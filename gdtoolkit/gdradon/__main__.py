@@ -6,6 +6,7 @@ Usage:
   gdradon cc <path>... [options]
 
 Options:
+  --trace=<file>             Write Chrome trace of the run to the file.
   -h --help                  Show this screen.
   --version                  Show version.
 
@@ -13,55 +14,59 @@ Examples:
   gdradon cc file1.gd file2.gd path/
 """
 import sys
-from typing import List
 
 from docopt import docopt
-from radon.complexity import cc_rank, cc_visit
-from radon.visitors import Function
-from radon.cli.colors import LETTERS_COLORS, RANKS_COLORS, RESET
 
+from gdtoolkit.common.tracing import enable_tracing, file_spans, span
 from gdtoolkit.common.utils import find_gd_files_from_paths
-from gdtoolkit.gd2py import convert_code
 from gdtoolkit.common.version import get_gdtoolkit_version
 
-Path = str
-
 
 def main():
     sys.stdout.reconfigure(encoding="utf-8")
     arguments = docopt(__doc__, version="gdradon {}".format(get_gdtoolkit_version()))
+    enable_tracing(arguments["--trace"])
 
-    files: List[Path] = find_gd_files_from_paths(arguments["<path>"])
-    for file_path in files:
+    for file_path in file_spans(find_gd_files_from_paths(arguments["<path>"])):
         _cc(file_path)
 
 
 def _cc(file_path: str) -> None:
+    # radon and the converter are imported only when there are files to analyze
+    # pylint: disable=import-outside-toplevel
+    from radon.complexity import cc_rank, cc_visit
+    from radon.visitors import Function
+    from radon.cli.colors import LETTERS_COLORS, RANKS_COLORS, RESET
+    from gdtoolkit.gd2py import convert_code
+
     try:
-        with open(file_path, "r", encoding="utf-8") as fh:
-            python_code = convert_code(fh.read())
+        with span("read"), open(file_path, "r", encoding="utf-8") as fh:
+            code = fh.read()
+        with span("convert"):
+            python_code = convert_code(code)
+        with span("cc"):
             results = cc_visit(python_code)
-            if results == []:
-                return
-            print(file_path)
-            for result in results:
-                letter = "F" if isinstance(result, Function) else "C"
-                rank = cc_rank(result.complexity)
-                # pylint: disable=duplicate-string-formatting-argument
-                print(
-                    "    {}{}{} {}:{} {} - {}{} ({}){}".format(
-                        LETTERS_COLORS[letter],
-                        letter,
-                        RESET,
-                        result.lineno,
-                        result.col_offset,
-                        result.name,
-                        RANKS_COLORS[rank],
-                        rank,
-                        result.complexity,
-                        RESET,
-                    )
+        if results == []:
+            return
+        print(file_path)
+        for result in results:
+            letter = "F" if isinstance(result, Function) else "C"
+            rank = cc_rank(result.complexity)
+            # pylint: disable=duplicate-string-formatting-argument
+            print(
+                "    {}{}{} {}:{} {} - {}{} ({}){}".format(
+                    LETTERS_COLORS[letter],
+                    letter,
+                    RESET,
+                    result.lineno,
+                    result.col_offset,
+                    result.name,
+                    RANKS_COLORS[rank],
+                    rank,
+                    result.complexity,
+                    RESET,
                 )
+            )
     except OSError as e:
         print(
             "Cannot open file '{}': {}".format(file_path, e.strerror),
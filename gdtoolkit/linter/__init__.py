@@ -1,19 +1,14 @@
 import re
 from collections import defaultdict
 from types import MappingProxyType
-from typing import List, Dict, Set
+from typing import TYPE_CHECKING, List, Dict, Optional, Set
 
+from ..common.tracing import span
 from .problem import Problem
-from ..parser import parser
 from .types import Range
-from . import (
-    basic_checks,
-    class_checks,
-    design_checks,
-    format_checks,
-    name_checks,
-    misc_checks,
-)
+
+if TYPE_CHECKING:
+    from lark import Tree
 
 PASCAL_CASE = r"([A-Z][a-z0-9]*)+"
 SNAKE_CASE = r"[a-z][a-z0-9]*(_[a-z0-9]+)*"
@@ -110,15 +105,40 @@ DEFAULT_CONFIG = MappingProxyType(
 
 
 def lint_code(
-    gdscript_code: str, config: MappingProxyType = DEFAULT_CONFIG
+    gdscript_code: str,
+    config: MappingProxyType = DEFAULT_CONFIG,
+    parse_tree: Optional["Tree"] = None,
 ) -> List[Problem]:
-    parse_tree = parser.parse(gdscript_code, gather_metadata=True)
-    problems = design_checks.lint(parse_tree, config)
-    problems += format_checks.lint(gdscript_code, config)
-    problems += name_checks.lint(parse_tree, config)
-    problems += class_checks.lint(parse_tree, config)
-    problems += basic_checks.lint(parse_tree, config)
-    problems += misc_checks.lint(parse_tree, config)
+    # checks and the parser are loaded upon first use only, so that importing
+    # the config (e.g. by gdlint --help) stays cheap
+    # pylint: disable=import-outside-toplevel
+    from ..parser import parser
+    from . import (
+        basic_checks,
+        class_checks,
+        design_checks,
+        format_checks,
+        name_checks,
+        misc_checks,
+    )
+
+    parse_tree = (
+        parse_tree
+        if parse_tree is not None
+        else parser.parse(gdscript_code, gather_metadata=True)
+    )
+    with span("lint design_checks"):
+        problems = design_checks.lint(parse_tree, config)
+    with span("lint format_checks"):
+        problems += format_checks.lint(gdscript_code, config)
+    with span("lint name_checks"):
+        problems += name_checks.lint(parse_tree, config)
+    with span("lint class_checks"):
+        problems += class_checks.lint(parse_tree, config)
+    with span("lint basic_checks"):
+        problems += basic_checks.lint(parse_tree, config)
+    with span("lint misc_checks"):
+        problems += misc_checks.lint(parse_tree, config)
 
     problems_to_lines_where_they_are_inactive = _fetch_problem_inactivity_lines(
         gdscript_code
@@ -11,37 +11,51 @@ Usage:
 Options:
   -d --dump-default-config   Dump default config to 'gdlintrc' file
   -v --verbose               Show extra prints
+  --no-cache                 Don't use the cache of already linted files.
+  --gitignore                Skip files and directories ignored by .gitignore.
+  --project-scripts-first    Process autoload and main scene scripts first.
+  --trace=<file>             Write Chrome trace of the run to the file.
   -h --help                  Show this screen.
   --version                  Show version.
 """
 import sys
 import os
+import json
 import logging
-import pathlib
-from typing import List, Optional
 from types import MappingProxyType
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
 
-import lark
-import yaml
 from docopt import docopt
 
 from gdtoolkit.linter import lint_code, DEFAULT_CONFIG
+from gdtoolkit.linter.config import CONFIG_FILE_NAME, load_config
+from gdtoolkit.linter.problem import Problem
 from gdtoolkit.linter.problem_printer import print_problem
-from gdtoolkit.common.exceptions import (
-    lark_unexpected_token_to_str,
-    lark_unexpected_input_to_str,
-)
+from gdtoolkit.common.cache import ArtifactStore
+from gdtoolkit.common.tracing import enable_tracing, file_spans, span
 from gdtoolkit.common.utils import find_gd_files_from_paths
 from gdtoolkit.common.version import get_gdtoolkit_version
 
-
-Path = str
-
-CONFIG_FILE_NAME = "gdlintrc"
+if TYPE_CHECKING:
+    from lark import Tree
+
+# checks which look at whole functions or classes rather than single statements
+SCOPE_CHECKS = frozenset(
+    {
+        "duplicated-load",
+        "unnecessary-pass",
+        "unused-argument",
+        "class-definitions-order",
+        "max-public-methods",
+        "no-elif-return",
+        "no-else-return",
+    }
+)
 
 
 def main():
     arguments = docopt(__doc__, version="gdlint {}".format(get_gdtoolkit_version()))
+    enable_tracing(arguments["--trace"])
 
     if arguments["--verbose"]:
         logging.basicConfig(stream=sys.stdout, level=logging.INFO)
@@ -49,18 +63,21 @@ def main():
     if arguments["--dump-default-config"]:
         _dump_default_config()
 
-    config_file_path = _find_config_file()
-    config = _load_config_file_or_default(config_file_path)
-    _log_config_entries(config)
-    _update_config_with_missing_entries_inplace(config)
+    config = load_config()
+    store = None if arguments["--no-cache"] else ArtifactStore()
 
     problems_total = 0
 
-    files: List[Path] = find_gd_files_from_paths(
-        arguments["<path>"], excluded_directories=set(config["excluded_directories"])
+    files = find_gd_files_from_paths(
+        arguments["<path>"],
+        excluded_directories=frozenset(config["excluded_directories"]),
+        use_gitignore=arguments["--gitignore"],
+        project_scripts_first=arguments["--project-scripts-first"],
     )
-    for file_path in files:
-        problems_total += _lint_file(file_path, config)
+    for file_path in file_spans(files):
+        problems_total += _lint_file(file_path, config, store)
+    if store is not None:
+        store.save()
 
     if problems_total > 0:
         print(
@@ -75,6 +92,8 @@ def main():
 
 
 def _dump_default_config() -> None:
+    import yaml  # pylint: disable=import-outside-toplevel
+
     # TODO: error handling
     assert not os.path.isfile(CONFIG_FILE_NAME)
     with open(CONFIG_FILE_NAME, "w", encoding="utf-8") as fh:
@@ -82,79 +101,107 @@ def _dump_default_config() -> None:
     sys.exit(0)
 
 
-def _find_config_file() -> Optional[str]:
-    search_dir = pathlib.Path(os.getcwd())
-    config_file_path = None
-    while search_dir != pathlib.Path(os.path.abspath(os.sep)):
-        file_path = os.path.join(search_dir, CONFIG_FILE_NAME)
-        if os.path.isfile(file_path):
-            config_file_path = file_path
-            break
-        file_path = os.path.join(search_dir, ".{}".format(CONFIG_FILE_NAME))
-        if os.path.isfile(file_path):
-            config_file_path = file_path
-            break
-        search_dir = search_dir.parent
-    return config_file_path
-
-
-def _load_config_file_or_default(config_file_path: Optional[str]) -> MappingProxyType:
-    # TODO: error handling
-    if config_file_path is not None:
-        logging.info("Config file found: '%s'", config_file_path)
-        with open(config_file_path, "r", encoding="utf-8") as fh:
-            return yaml.load(fh.read(), Loader=yaml.Loader)
-
-    logging.info("""No 'gdlintrc' nor '.gdlintrc' found. Using default config...""")
-    return DEFAULT_CONFIG
-
-
-def _log_config_entries(config: MappingProxyType) -> None:
-    logging.info("Loaded config:")
-    for entry in config.items():
-        logging.info(entry)
-
-
-def _update_config_with_missing_entries_inplace(config: dict) -> None:
-    for key in DEFAULT_CONFIG:
-        if key not in config:
-            logging.info(
-                "Adding missing entry from defaults: %s", (key, DEFAULT_CONFIG[key])
-            )
-            config[key] = DEFAULT_CONFIG[key]
-
-
-def _lint_file(file_path: str, config: MappingProxyType) -> int:
+def _lint_file(
+    file_path: str, config: MappingProxyType, store: Optional[ArtifactStore]
+) -> int:
     try:
-        with open(file_path, "r", encoding="utf-8") as fh:
+        with span("read"), open(file_path, "r", encoding="utf-8") as fh:
             content = fh.read()
-            problems = lint_code(content, config)
-            if len(problems) > 0:  # TODO: friendly frontend like in halint
-                for problem in problems:
-                    print_problem(problem, file_path)
-            return len(problems)
     except OSError as e:
         print(
             "Cannot open file '{}': {}".format(file_path, e.strerror),
             file=sys.stderr,
         )
         return 1
-    except lark.exceptions.UnexpectedToken as e:
+    # problems depend on the config as well
+    config_items = json.dumps(dict(config), sort_keys=True, default=sorted)
+    problems = (
+        store.get("gdlint", content, options=config_items)
+        if store is not None
+        else None
+    )
+    syntax_errors_num = 0
+    if problems is None:
+        syntax_errors_num, problems = _lint_code(file_path, content, config)
+        if store is not None and syntax_errors_num == 0:
+            store.put("gdlint", content, problems, options=config_items)
+    if len(problems) > 0:  # TODO: friendly frontend like in halint
+        for problem in problems:
+            print_problem(problem, file_path)
+    return syntax_errors_num + len(problems)
+
+
+def _lint_code(
+    file_path: str, content: str, config: MappingProxyType
+) -> Tuple[int, List[Problem]]:
+    # pylint: disable=import-outside-toplevel
+    from gdtoolkit.common.exceptions import lark_syntax_error_to_str
+    from gdtoolkit.parser import parser
+
+    # all syntax errors are reported and the statements which parsed are linted
+    outcome = parser.parse_with_error_recovery(content, gather_metadata=True)
+    for error in outcome.errors:
         print(
             f"{file_path}:\n",
-            lark_unexpected_token_to_str(e, content),
+            lark_syntax_error_to_str(error, content),
             sep="\n",
             file=sys.stderr,
         )
-        return 1
-    except lark.exceptions.UnexpectedInput as e:
-        print(
-            f"{file_path}:\n",
-            lark_unexpected_input_to_str(e),
-            sep="\n",
-            file=sys.stderr,
+    if outcome.tree is None:
+        return len(outcome.errors), []
+    # problems of checks looking at whole functions or classes can't be trusted
+    # if some statements of them are missing
+    broken_scopes = _find_broken_scopes(
+        outcome.tree, content.splitlines(), outcome.skipped_lines
+    )
+    problems = [
+        problem
+        for problem in lint_code(content, config, outcome.tree)
+        if problem.line not in outcome.skipped_lines
+        and not (
+            problem.name in SCOPE_CHECKS
+            and any(begin <= problem.line <= end for begin, end in broken_scopes)
         )
-        return 1
+    ]
+    return len(outcome.errors), problems
+
+
+def _find_broken_scopes(
+    tree: "Tree", lines: List[str], skipped_lines: Set[int]
+) -> List[Tuple[int, int]]:
+    # returns line spans of innermost functions and classes containing skipped
+    # lines, the whole file stands for the top-level class
+    scopes = [
+        _scope_span(lines, subtree.meta.line)
+        for subtree in tree.iter_subtrees()
+        if (subtree.data == "class_def" or subtree.data.endswith("func_def"))
+        and not subtree.meta.empty
+    ]
+    broken_scopes = set()
+    for line in skipped_lines:
+        enclosing_scopes = [(b, e) for b, e in scopes if b <= line <= e]
+        broken_scopes.add(
+            max(enclosing_scopes) if len(enclosing_scopes) > 0 else (1, len(lines))
+        )
+    return list(broken_scopes)
+
+
+def _scope_span(lines: List[str], first_line: int) -> Tuple[int, int]:
+    # the scope lasts until the next line which is not indented deeper
+    indentation = _indentation_length(lines[first_line - 1])
+    last_line = first_line
+    for line in range(first_line + 1, len(lines) + 1):
+        text = lines[line - 1]
+        if text.strip() == "":
+            continue
+        if _indentation_length(text) <= indentation:
+            break
+        last_line = line
+    return first_line, last_line
+
+
+def _indentation_length(line: str) -> int:
+    return len(line) - len(line.lstrip())
 
 
 if __name__ == "__main__":
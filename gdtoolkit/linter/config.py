@@ -0,0 +1,63 @@
+import logging
+import os
+import pathlib
+from types import MappingProxyType
+from typing import Optional
+
+from . import DEFAULT_CONFIG
+
+CONFIG_FILE_NAME = "gdlintrc"
+
+
+def load_config() -> MappingProxyType:
+    """Loads config file found in current directory or its parents
+    and completes it with defaults"""
+    loaded_config = load_config_file_or_default(find_config_file())
+    _log_config_entries(loaded_config)
+    config = dict(loaded_config)
+    update_config_with_missing_entries_inplace(config)
+    return MappingProxyType(config)
+
+
+def find_config_file() -> Optional[str]:
+    search_dir = pathlib.Path(os.getcwd())
+    config_file_path = None
+    while search_dir != pathlib.Path(os.path.abspath(os.sep)):
+        file_path = os.path.join(search_dir, CONFIG_FILE_NAME)
+        if os.path.isfile(file_path):
+            config_file_path = file_path
+            break
+        file_path = os.path.join(search_dir, ".{}".format(CONFIG_FILE_NAME))
+        if os.path.isfile(file_path):
+            config_file_path = file_path
+            break
+        search_dir = search_dir.parent
+    return config_file_path
+
+
+def load_config_file_or_default(config_file_path: Optional[str]) -> MappingProxyType:
+    # TODO: error handling
+    if config_file_path is not None:
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        logging.info("Config file found: '%s'", config_file_path)
+        with open(config_file_path, "r", encoding="utf-8") as fh:
+            return yaml.load(fh.read(), Loader=yaml.Loader)
+
+    logging.info("""No 'gdlintrc' nor '.gdlintrc' found. Using default config...""")
+    return DEFAULT_CONFIG
+
+
+def _log_config_entries(config: MappingProxyType) -> None:
+    logging.info("Loaded config:")
+    for entry in config.items():
+        logging.info(entry)
+
+
+def update_config_with_missing_entries_inplace(config: dict) -> None:
+    for key in DEFAULT_CONFIG:
+        if key not in config:
+            logging.info(
+                "Adding missing entry from defaults: %s", (key, DEFAULT_CONFIG[key])
+            )
+            config[key] = DEFAULT_CONFIG[key]
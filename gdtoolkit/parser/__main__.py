@@ -1,7 +1,7 @@
 """GDScript parser
 
 By default, nothing is being printed on success and the exitcode is 0.
-On failure, python exception is shown and exitcode is non-zero.
+On failure, all syntax errors are shown and exitcode is non-zero.
 
 Usage:
   gdparse <file>... [options]
@@ -9,20 +9,18 @@ Usage:
 Options:
   -p --pretty   Print pretty parse tree
   -v --verbose  Print parse tree
+  --trace=<file>  Write Chrome trace of the run to the file.
   -h --help     Show this screen.
   --version     Show version.
 """
 import sys
 from typing import Dict
 
-import lark
 from docopt import docopt
 
 from gdtoolkit.parser import parser
-from gdtoolkit.common.exceptions import (
-    lark_unexpected_token_to_str,
-    lark_unexpected_input_to_str,
-)
+from gdtoolkit.common.exceptions import lark_syntax_error_to_str
+from gdtoolkit.common.tracing import enable_tracing, file_spans, span
 from gdtoolkit.common.version import get_gdtoolkit_version
 
 
@@ -31,6 +29,7 @@ def main():
         __doc__,
         version="gdparse {}".format(get_gdtoolkit_version()),
     )
+    enable_tracing(arguments["--trace"])
     files = arguments["<file>"]
 
     success = True
@@ -39,7 +38,7 @@ def main():
         file_content = sys.stdin.read()
         success = _parse_file_content(file_content, arguments)
     else:
-        for file_path in files:
+        for file_path in file_spans(files):
             success &= _parse_file(file_path, arguments)
 
     if not success:
@@ -48,9 +47,9 @@ def main():
 
 def _parse_file(file_path: str, arguments: Dict) -> bool:
     try:
-        with open(file_path, "r", encoding="utf-8") as fh:
+        with span("read"), open(file_path, "r", encoding="utf-8") as fh:
             file_content = fh.read()
-            return _parse_file_content(file_content, arguments, file_path)
+        return _parse_file_content(file_content, arguments, file_path)
     except OSError as e:
         print(
             "Cannot open file '{}': {}".format(file_path, e.strerror),
@@ -61,23 +60,16 @@ def _parse_file(file_path: str, arguments: Dict) -> bool:
 
 def _parse_file_content(content: str, arguments: Dict, file_path: str = None) -> bool:
     actual_file_path = "STDIN" if file_path is None else file_path
-    try:
-        tree = parser.parse(content)  # TODO: handle exceptions
-    except lark.exceptions.UnexpectedToken as e:
-        print(
-            f"{actual_file_path}:\n",
-            lark_unexpected_token_to_str(e, content),
-            sep="\n",
-            file=sys.stderr,
-        )
-        return False
-    except lark.exceptions.UnexpectedInput as e:
+    outcome = parser.parse_with_error_recovery(content)
+    for error in outcome.errors:
         print(
             f"{actual_file_path}:\n",
-            lark_unexpected_input_to_str(e),
+            lark_syntax_error_to_str(error, content),
             sep="\n",
             file=sys.stderr,
         )
+    tree = outcome.tree
+    if tree is None or len(outcome.errors) > 0:
         return False
     if arguments["--pretty"]:
         print(f"{actual_file_path}:\n")
@@ -5,12 +5,17 @@ and to get an intermediate representation as a Lark Tree.
 """
 import os
 import pickle
-import sys
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from gdtoolkit.common.tracing import span
+from gdtoolkit.common.utils import get_cache_directory
 from gdtoolkit.common.version import get_gdtoolkit_version
 
 from lark import Lark, Tree, indenter
+from lark.exceptions import UnexpectedInput, UnexpectedToken
 from lark.grammar import Rule
-from lark.lexer import TerminalDef
+from lark.lexer import TerminalDef, Token
 
 
 class Indenter(indenter.Indenter):
@@ -23,6 +28,21 @@ class Indenter(indenter.Indenter):
     tab_len = 4
 
 
+# each of them is a full parse, so the recovery gives up after that many
+MAX_ERROR_RECOVERY_PARSES = 20
+
+
+@dataclass
+class RecoveredParse:
+    """Outcome of parsing with error recovery, tree is None if the code
+    could not be recovered"""
+
+    tree: Optional[Tree]
+    errors: List[UnexpectedInput] = field(default_factory=list)
+    # lines replaced in order to parse the rest of the code (1-based)
+    skipped_lines: Set[int] = field(default_factory=set)
+
+
 # When upgrading to Python 3.8, replace with functools.cached_property
 class cached_property:
     """A property that is only computed once per instance and then replaces
@@ -49,7 +69,6 @@ class Parser:
     def __init__(self):
         self._directory = os.path.dirname(__file__)
         self._use_grammar_cache = True
-        self._cache_dirpath: str = os.path.join(get_cache_directory(), "gdtoolkit")
 
     def parse(self, code: str, gather_metadata: bool = False) -> Tree:
         """Parses GDScript code and returns an intermediate representation as a Lark Tree.
@@ -57,16 +76,69 @@ class Parser:
         line and column numbers for statements and rules.
         """
         code += "\n"  # to overcome lark bug (#489)
-        return (
-            self._parser_with_metadata.parse(code)
-            if gather_metadata
-            else self._parser.parse(code)
-        )
+        a_parser = self._parser_with_metadata if gather_metadata else self._parser
+        with span("parse"):
+            return a_parser.parse(code)
+
+    def parse_with_error_recovery(
+        self, code: str, gather_metadata: bool = False
+    ) -> RecoveredParse:
+        """Parses GDScript code like parse, but instead of raising upon
+        the first syntax error, collects all of them. Each erroneous statement
+        (along with its block, if any) is replaced with 'pass' and the code
+        is parsed again, so the tree lacks those statements. Line numbers
+        are kept intact and, if gather_metadata is True, the 'pass' placeholders
+        are removed from the tree. If the code can't be recovered within
+        MAX_ERROR_RECOVERY_PARSES parses, the tree is None.
+        """
+        lines = code.splitlines()
+        patched_lines = list(lines)
+        outcome = RecoveredParse(None)
+        region = None  # type: Optional[Tuple[int, int]]
+        # each retry either moves past an error or grows the replaced region
+        for _ in range(min(2 * len(lines) + 2, MAX_ERROR_RECOVERY_PARSES)):
+            try:
+                outcome.tree = self.parse("\n".join(patched_lines), gather_metadata)
+                _remove_placeholders(outcome.tree, outcome.skipped_lines)
+                return outcome
+            except UnexpectedInput as e:
+                # tokens made up by the indenter have no position
+                error_line = (
+                    e.line
+                    if isinstance(e.line, int) and 1 <= e.line <= len(lines)
+                    else len(lines)
+                )
+                if region is None or error_line > region[1]:
+                    if isinstance(e, UnexpectedToken) and error_line != e.line:
+                        e = _move_error_to_end_of_code(e, code)
+                    else:
+                        _move_error_to_original_code(e, code, patched_lines)
+                    outcome.errors.append(e)
+                    # errors within brackets belong to the statement opening them
+                    first_line = _unclosed_bracket_line(patched_lines, error_line)
+                    region = _statement_region(
+                        lines,
+                        first_line if first_line is not None else error_line,
+                        error_line,
+                    )
+                else:
+                    # replacement was not enough, the statement begins earlier
+                    first_line = _previous_statement_line(
+                        lines, region[0], outcome.skipped_lines
+                    )
+                    if first_line is None:
+                        break
+                    region = _statement_region(lines, first_line, region[1])
+            _replace_region(lines, patched_lines, region)
+            outcome.skipped_lines.update(range(region[0], region[1] + 1))
+        return outcome
 
     def parse_comments(self, code: str) -> Tree:
         """Parses GDScript code and returns comments - both standalone, and inline."""
         code += "\n"  # to overcome lark bug (#489)
-        return self._comment_parser.parse(code)
+        comment_parser = self._comment_parser
+        with span("comment parse"):
+            return comment_parser.parse(code)
 
     def disable_grammar_caching(self) -> None:
         self._use_grammar_cache = False
@@ -81,27 +153,28 @@ class Parser:
 
         tree: Tree = None
         cache_filepath: str = (
-            os.path.join(self._cache_dirpath, version, name) + ".pickle"
+            os.path.join(get_cache_directory(), "gdtoolkit", version, name) + ".pickle"
         )
         grammar_filepath: str = os.path.join(self._directory, grammar_filename)
 
         tree = None
-        if os.path.exists(cache_filepath) and self._use_grammar_cache:
-            try:
-                tree = self.load(cache_filepath)
-            except ValueError:
-                # pickle errors on unsupported protocols - newer python versions (#93)
-                pass
-        if tree is None:
-            tree = Lark.open(
-                grammar_filepath,
-                parser="lalr",
-                start="start",
-                postlex=Indenter(),
-                propagate_positions=add_metadata,
-                maybe_placeholders=False,
-            )
-            self.save(tree, cache_filepath)
+        with span("grammar load", parser=name):
+            if os.path.exists(cache_filepath) and self._use_grammar_cache:
+                try:
+                    tree = self.load(cache_filepath)
+                except ValueError:
+                    # pickle errors on unsupported protocols - newer python versions (#93)
+                    pass
+            if tree is None:
+                tree = Lark.open(
+                    grammar_filepath,
+                    parser="lalr",
+                    start="start",
+                    postlex=Indenter(),
+                    propagate_positions=add_metadata,
+                    maybe_placeholders=False,
+                )
+                self.save(tree, cache_filepath)
 
         return tree
 
@@ -150,16 +223,105 @@ class Parser:
             )
 
 
-def get_cache_directory() -> str:
-    """Returns the cache directory based on the user's operating system"""
-    directory: str = ""
-    if sys.platform in ["linux", "linux2"]:
-        directory = os.path.join(os.path.expanduser("~"), ".cache")
-    elif sys.platform == "darwin":
-        directory = os.path.join(os.path.expanduser("~"), "Library", "Caches")
-    elif sys.platform == "win32":
-        directory = os.path.expandvars(r"%LOCALAPPDATA%")
-    return directory
+def _indentation(line: str) -> str:
+    return line[: len(line) - len(line.lstrip())]
+
+
+def _remove_placeholders(tree: Tree, skipped_lines: Set[int]) -> None:
+    if len(skipped_lines) == 0:
+        return
+    for subtree in tree.iter_subtrees():
+        subtree.children = [
+            child
+            for child in subtree.children
+            if not (
+                isinstance(child, Tree)
+                and child.data == "pass_stmt"
+                and not child.meta.empty
+                and child.meta.line in skipped_lines
+            )
+        ]
+
+
+def _unclosed_bracket_line(lines: List[str], line: int) -> Optional[int]:
+    # returns the line of the outermost bracket left open before the line,
+    # strings and comments are skipped roughly
+    opening_lines = []  # type: List[int]
+    for line_number, text in enumerate(lines[: line - 1], start=1):
+        quote = None
+        for character in text:
+            if quote is not None:
+                quote = None if character == quote else quote
+            elif character in "\"'":
+                quote = character
+            elif character == "#":
+                break
+            elif character in "([{":
+                opening_lines.append(line_number)
+            elif character in ")]}" and len(opening_lines) > 0:
+                opening_lines.pop()
+    return opening_lines[0] if len(opening_lines) > 0 else None
+
+
+def _move_error_to_end_of_code(error: UnexpectedToken, code: str) -> UnexpectedToken:
+    # e.g. unexpected _DEDENT or $END, reported at the end of the last line
+    original_lines = code.splitlines(keepends=True)
+    if len(original_lines) == 0:
+        return error
+    last_line = original_lines[-1].rstrip("\r\n")
+    token = Token(
+        error.token.type,
+        error.token.value,
+        pos_in_stream=len(code) - len(original_lines[-1]) + len(last_line),
+        line=len(original_lines),
+        column=len(last_line) + 1,
+    )
+    return UnexpectedToken(token, error.expected, error.considered_rules, error.state)
+
+
+def _move_error_to_original_code(
+    error: UnexpectedInput, code: str, patched_lines: List[str]
+) -> None:
+    # the error's line is never patched, but the lines before might have been
+    if not isinstance(error.pos_in_stream, int) or not isinstance(error.line, int):
+        return
+    original_lines = code.splitlines(keepends=True)
+    line = error.line - 1
+    error.pos_in_stream += sum(len(text) for text in original_lines[:line]) - sum(
+        len(text) + 1 for text in patched_lines[:line]
+    )
+
+
+def _statement_region(lines: List[str], first: int, last: int) -> Tuple[int, int]:
+    # extends the region with lines indented deeper than its first line
+    # (block or continuation), as they make no sense without it
+    indentation = len(_indentation(lines[first - 1]))
+    line = last
+    while line < len(lines) and (
+        lines[line].strip() == "" or len(_indentation(lines[line])) > indentation
+    ):
+        line += 1
+    while line > last and lines[line - 1].strip() == "":
+        line -= 1
+    return first, line
+
+
+def _previous_statement_line(
+    lines: List[str], line: int, skipped_lines: Set[int]
+) -> Optional[int]:
+    line -= 1
+    while line >= 1 and (line in skipped_lines or lines[line - 1].strip() == ""):
+        line -= 1
+    return line if line >= 1 else None
+
+
+def _replace_region(
+    lines: List[str], patched_lines: List[str], region: Tuple[int, int]
+) -> None:
+    first, last = region
+    patched_lines[first - 1] = _indentation(lines[first - 1]) + "pass"
+    for line in range(first + 1, last + 1):
+        patched_lines[line - 1] = ""
 
 
 parser = Parser()
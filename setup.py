@@ -29,6 +29,7 @@ setup(
             "gdformat = gdtoolkit.formatter.__main__:main",
             "gd2py = gdtoolkit.gd2py.__main__:main",
             "gdradon = gdtoolkit.gdradon.__main__:main",
+            "gdtoolkit = gdtoolkit.__main__:main",
         ]
     },
     include_package_data=True,
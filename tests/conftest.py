@@ -1,3 +1,5 @@
+import os
+
 import pytest
 
 from gdtoolkit.parser import parser
@@ -6,3 +8,15 @@ from gdtoolkit.parser import parser
 @pytest.fixture(scope="session", autouse=True)
 def disable_parser_caching():
     parser.disable_grammar_caching()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolate_cache_directory(tmp_path_factory):
+    # tools run as subprocesses inherit the environment
+    previous_cache_home = os.environ.get("XDG_CACHE_HOME")
+    os.environ["XDG_CACHE_HOME"] = str(tmp_path_factory.mktemp("cache"))
+    yield
+    if previous_cache_home is None:
+        del os.environ["XDG_CACHE_HOME"]
+    else:
+        os.environ["XDG_CACHE_HOME"] = previous_cache_home
@@ -0,0 +1,8 @@
+var a = [[[[[[[[[[[[[[[[[[[[1, 2, 3]]]]]]]]]]]]]]]]]]]]
+var b = [[1111111111, 2222222222, 3333333333], [4444444444, 5555555555, 6666666666], [7777777777, 8888888888]]
+var c = {"first": [1111111111, 2222222222, 3333333333, 4444444444], "second": {"nested": [5555555555, 6666666666, 7777777777]}, "third": []}
+var d = [{"key": [1, 2, 3], "other_key": [4, 5, 6]}, {"key": [7, 8, 9], "other_key": [10, 11, 12]}, {"key": [], "other_key": [13]}]
+var e = [[1, 2,], [3, 4], [[5, 6], [7, 8,]]]
+func foo():
+	bar([1111111111, [2222222222, 3333333333, [4444444444, 5555555555]]], {"x": [6666666666, 7777777777]}, [[8888888888]])
+	return [[[[1111111111111111111111, 2222222222222222222222], 3333333333333333333333], 4444444444444444444444], 5555555555555]
@@ -0,0 +1,17 @@
+from gdtoolkit.formatter.cache import FormattingCache
+
+
+def test_cache_persists_added_code(tmp_path):
+    cache = FormattingCache(100, cache_dirpath=str(tmp_path))
+    assert not cache.contains("tool\n")
+    cache.add("tool\n")
+    assert cache.contains("tool\n")
+    cache.save()
+    assert FormattingCache(100, cache_dirpath=str(tmp_path)).contains("tool\n")
+
+
+def test_cache_is_line_length_specific(tmp_path):
+    cache = FormattingCache(100, cache_dirpath=str(tmp_path))
+    cache.add("tool\n")
+    cache.save()
+    assert not FormattingCache(80, cache_dirpath=str(tmp_path)).contains("tool\n")
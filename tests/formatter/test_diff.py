@@ -0,0 +1,48 @@
+import difflib
+
+import pytest
+
+from gdtoolkit.formatter.diff import get_opcodes, unified_diff
+
+
+# fmt: off
+@pytest.mark.parametrize("a_lines,b_lines", [
+([], []),
+(["a"], []),
+([], ["a"]),
+(["a", "b", "c"], ["a", "b", "c"]),
+(["a", "b", "c"], ["a", "x", "c"]),
+(["a", "b", "c", "d"], ["b", "c", "x", "d", "e"]),
+(["x = 1", "y=2", "z = 3"] * 20, ["x = 1", "y = 2", "z = 3"] * 20),
+(["[1,2],", "[3, 4],"] * 500, ["[1, 2],", "[3, 4],"] * 500),
+(["a", "x", "b", "y", "c"] * 3, ["c", "y", "b", "x", "a"] * 3),
+(["line {}".format(i) for i in range(300)] * 2, ["line {}".format(i) for i in range(600)]),
+])
+# fmt: on
+def test_opcodes_transform_sequences(a_lines, b_lines):
+    transformed_lines = []
+    for tag, i1, i2, j1, j2 in get_opcodes(a_lines, b_lines):
+        if tag == "equal":
+            assert a_lines[i1:i2] == b_lines[j1:j2]
+        transformed_lines += b_lines[j1:j2]
+    assert transformed_lines == b_lines
+
+
+def test_unified_diff_matches_difflib():
+    a_lines = ["line {}".format(i) for i in range(30)]
+    b_lines = a_lines[:5] + ["new line"] + a_lines[6:20] + a_lines[21:]
+    for context in [0, 1, 3]:
+        expected = difflib.unified_diff(
+            a_lines, b_lines, "a.gd", "b.gd", n=context, lineterm=""
+        )
+        assert list(unified_diff(a_lines, b_lines, "a.gd", "b.gd", context)) == list(
+            expected
+        )
+
+
+def test_unified_diff_hunks_limit():
+    a_lines = ["line {}".format(i) for i in range(30)]
+    b_lines = ["changed {}".format(i) if i % 10 == 0 else a_lines[i] for i in range(30)]
+    diff = list(unified_diff(a_lines, b_lines, context=1, max_hunks=2))
+    assert len([line for line in diff if line.startswith("@@ -")]) == 2
+    assert diff[-1] == "@@ further hunks omitted @@"
@@ -1,4 +1,10 @@
+import json
+import os
+import stat
 import subprocess
+import sys
+
+import pytest
 
 from ..common import write_file, normalized_stderr
 
@@ -127,3 +133,226 @@ def test_valid_unformatted_file_diff(tmp_path):
     assert len(outcome.stdout.decode().splitlines()) == 0
     assert len(normalized_stderr(outcome.stderr)) > 2
     assert "+++" in "\n".join(normalized_stderr(outcome.stderr))
+
+
+def test_unformatted_file_checking_with_cache(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "tool;var x")
+    for _ in range(2):
+        outcome = subprocess.run(
+            ["gdformat", "--check", dummy_file], check=False, capture_output=True
+        )
+        assert outcome.returncode != 0
+
+
+def test_formatted_file_checking_without_cache(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "tool\n")
+    outcome = subprocess.run(
+        ["gdformat", "--check", "--no-cache", dummy_file],
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 0
+    assert len(normalized_stderr(outcome.stderr)) == 0
+
+
+def test_line_range_formatting(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "var a=1\nvar b=2\n")
+    outcome = subprocess.run(
+        ["gdformat", "--lines=2:2", dummy_file], check=False, capture_output=True
+    )
+    assert outcome.returncode == 0
+    with open(dummy_file, "r") as fh:
+        assert fh.read() == "var a=1\nvar b = 2\n"
+
+
+def test_invalid_line_range(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "pass\n")
+    outcome = subprocess.run(
+        ["gdformat", "--lines=x", dummy_file], check=False, capture_output=True
+    )
+    assert outcome.returncode != 0
+    assert "Traceback" not in outcome.stderr.decode()
+
+
+def test_reformatted_file_keeps_permissions(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "pass;pass")
+    os.chmod(dummy_file, 0o640)
+    outcome = subprocess.run(["gdformat", dummy_file], check=False, capture_output=True)
+    assert outcome.returncode == 0
+    assert stat.S_IMODE(os.stat(dummy_file).st_mode) == 0o640
+    assert os.listdir(tmp_path) == ["script.gd"]
+
+
+def test_formatted_file_is_not_touched(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "pass\n")
+    os.utime(dummy_file, (0, 0))
+    outcome = subprocess.run(["gdformat", dummy_file], check=False, capture_output=True)
+    assert outcome.returncode == 0
+    assert os.stat(dummy_file).st_mtime == 0
+
+
+def test_server_mode():
+    requests = b""
+    for code in ["var x=1", "var x=("]:
+        code_bytes = code.encode("utf-8")
+        requests += "{} 100\n".format(len(code_bytes)).encode("utf-8") + code_bytes
+    outcome = subprocess.run(
+        ["gdformat", "--serve", "--no-cache"],
+        input=requests,
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 0
+    responses = outcome.stdout
+    header, responses = responses.split(b"\n", 1)
+    assert header == b"ok 10"
+    assert responses[:10] == b"var x = 1\n"
+    header, responses = responses[10:].split(b"\n", 1)
+    assert header.startswith(b"error ")
+    assert len(responses) == int(header.split()[1])
+
+
+def _read_responses(responses):
+    while len(responses) > 0:
+        header, responses = responses.split(b"\n", 1)
+        status, length = header.split()
+        yield status, responses[: int(length)]
+        responses = responses[int(length) :]
+
+
+def test_server_mode_keeps_in_sync_after_bad_requests():
+    requests = (
+        b"7 x\nvar x=1"  # invalid line length
+        + b"2 100\n\xff\xfe"  # invalid UTF-8
+        + b"7 100\nvar x=1"
+        + b"x 100\nvar x=1"  # invalid code length, server stops
+        + b"7 100\nvar x=1"
+    )
+    outcome = subprocess.run(
+        ["gdformat", "--serve", "--no-cache"],
+        input=requests,
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 0
+    assert list(_read_responses(outcome.stdout)) == [
+        (b"error", b"Invalid request header"),
+        (b"error", b"Request payload is not valid UTF-8"),
+        (b"ok", b"var x = 1\n"),
+        (b"error", b"Invalid request header"),
+    ]
+
+
+def test_batch_mode():
+    documents = [{"code": "var x=1"}, {"code": "var x=(", "line_length": 50}]
+    outcome = subprocess.run(
+        ["gdformat", "--batch", "--no-cache"],
+        input="".join(json.dumps(document) + "\n" for document in documents).encode(),
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 1
+    results = [json.loads(line) for line in outcome.stdout.decode().splitlines()]
+    assert results[0] == {"code": "var x = 1\n"}
+    assert "error" in results[1]
+
+
+def test_batch_mode_answers_every_document():
+    # formatting this code with a tiny line length fails inside the formatter
+    with open(
+        os.path.join(
+            os.path.dirname(__file__),
+            "input-output-pairs",
+            "complex-export-statements.in.gd",
+        ),
+        "r",
+        encoding="utf-8",
+    ) as fh:
+        breaking_code = fh.read()
+    lines = [
+        json.dumps({"code": breaking_code, "line_length": 15}),
+        "",
+        "{invalid",
+        json.dumps({"code": "var x=1"}),
+    ]
+    outcome = subprocess.run(
+        ["gdformat", "--batch", "--no-cache"],
+        input="".join(line + "\n" for line in lines).encode(),
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 1
+    results = [json.loads(line) for line in outcome.stdout.decode().splitlines()]
+    assert results[0]["error"].startswith("Unexpected error: ")
+    assert results[1] == {"error": "Invalid document #2"}
+    assert results[2] == {"code": "var x = 1\n"}
+
+
+def test_directories_with_gdignore_are_skipped(tmp_path):
+    os.mkdir(os.path.join(tmp_path, "addons"))
+    write_file(tmp_path, "addons/.gdignore", "")
+    write_file(tmp_path, "addons/script.gd", "pass;pass")
+    write_file(tmp_path, "script.gd", "pass\n")
+    outcome = subprocess.run(
+        ["gdformat", "--check", tmp_path], check=False, capture_output=True
+    )
+    assert outcome.returncode == 0
+    assert outcome.stdout.decode() == "1 file would be left unchanged\n"
+
+
+def test_files_ignored_by_gitignore_are_skipped(tmp_path):
+    os.mkdir(os.path.join(tmp_path, "build"))
+    write_file(tmp_path, ".gitignore", "build/\n")
+    write_file(tmp_path, "build/script.gd", "pass;pass")
+    outcome = subprocess.run(
+        ["gdformat", "--check", "--gitignore", tmp_path],
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 0
+
+
+def test_trace_is_written(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "pass;pass")
+    trace_file = os.path.join(tmp_path, "trace.json")
+    outcome = subprocess.run(
+        ["gdformat", "--no-cache", "--trace={}".format(trace_file), dummy_file],
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 0
+    with open(trace_file, "r") as fh:
+        events = json.load(fh)["traceEvents"]
+    span_names = {event["name"] for event in events}
+    assert {"file", "read", "parse", "format_code", "write"} <= span_names
+    assert all(event["args"]["file"] == dummy_file for event in events)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 9), reason="requires tracemalloc.reset_peak")
+def test_memory_report_is_printed(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "pass;pass")
+    outcome = subprocess.run(
+        ["gdformat", "--check", "--no-cache", "--memory-report", dummy_file],
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode != 0
+    report = outcome.stderr.decode()
+    assert "Peak memory allocated" in report
+    assert "{}: format_code".format(dummy_file) in report
+
+
+def test_big_files_are_skipped(tmp_path):
+    small_file = write_file(tmp_path, "small.gd", "pass;pass")
+    big_file = write_file(tmp_path, "big.gd", "pass;pass" + " " * 100)
+    outcome = subprocess.run(
+        ["gdformat", "--no-cache", "--max-file-bytes=50", small_file, big_file],
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 0
+    assert "Skipping file '{}'".format(big_file) in outcome.stderr.decode()
+    with open(small_file, "r") as fh:
+        assert fh.read() == "pass\npass\n"
+    with open(big_file, "r") as fh:
+        assert fh.read().startswith("pass;pass")
@@ -0,0 +1,58 @@
+import pytest
+
+from gdtoolkit.formatter import format_code, check_formatting_safety
+
+
+MAX_LINE_LENGTH = 100
+
+
+# fmt: off
+@pytest.mark.parametrize("input_code,line_range,expected_output_code", [
+(
+"var a=1\nvar b=2\nvar c=3\n",
+(2, 2),
+"var a=1\nvar b = 2\nvar c=3\n",
+),
+(
+"var a=1\nfunc foo():\n\tvar x=1\n\tvar y=2\nvar c=3\n",
+(4, 4),
+"var a=1\nfunc foo():\n\tvar x=1\n\tvar y = 2\nvar c=3\n",
+),
+(
+"var a=1\n\n\n\nvar b=2\n",
+(5, 5),
+"var a=1\n\n\n\nvar b = 2\n",
+),
+(
+"var a=1\n# gdformat: off\nvar b=2\n# gdformat: on\nvar c=3\n",
+(1, 5),
+"var a = 1\n# gdformat: off\nvar b=2\n# gdformat: on\nvar c = 3\n",
+),
+(
+"var a=1;var b=2\nvar c=3\n",
+(2, 2),
+"var a=1;var b=2\nvar c = 3\n",
+),
+(
+"func f():\n\tif true:\n\t\tpass;pass\n\telse:\n\t\tvar q=1\n",
+(5, 5),
+"func f():\n\tif true:\n\t\tpass;pass\n\telse:\n\t\tvar q = 1\n",
+),
+])
+# fmt: on
+def test_formatting_line_range(input_code, line_range, expected_output_code):
+    formatted_code = format_code(
+        input_code, max_line_length=MAX_LINE_LENGTH, line_range=line_range
+    )
+    assert formatted_code == expected_output_code
+    check_formatting_safety(
+        input_code, formatted_code, MAX_LINE_LENGTH, line_range=line_range
+    )
+
+
+def test_whole_file_range_is_equivalent_to_regular_formatting():
+    input_code = "class X:\n\tvar a=1\n\n\n\n\tfunc foo():\n\t\tpass;pass\n"
+    formatted_code = format_code(
+        input_code, max_line_length=MAX_LINE_LENGTH, line_range=(1, 7)
+    )
+    assert formatted_code == format_code(input_code, max_line_length=MAX_LINE_LENGTH)
@@ -0,0 +1,170 @@
+import difflib
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+
+import pytest
+
+from gdtoolkit.formatter import format_code, check_formatting_safety
+from gdtoolkit.formatter.diff import unified_diff
+from gdtoolkit.parser import parser
+
+
+# Benchmarks are slow and timing-sensitive, so they run on demand only, e.g.:
+# GDTOOLKIT_BENCHMARKS=1 pytest -s tests/formatter/test_performance.py
+pytestmark = pytest.mark.skipif(
+    os.environ.get("GDTOOLKIT_BENCHMARKS") is None,
+    reason="set GDTOOLKIT_BENCHMARKS to run benchmarks",
+)
+
+MAX_LINE_LENGTH = 100
+REAL_WORLD_DATA_DIRS = ["./big-input-files", "../valid-gd-scripts"]
+# quadrupling the input may not increase the time more than that
+MAX_QUADRUPLING_TIME_RATIO = 4 * 1.5
+REPETITIONS = 5
+
+
+def _generate_functions(size):
+    return "".join(
+        "func foo_{}(a, b = 1):\n"
+        "\tvar x = a + b * 2  # comment\n"
+        "\tif x > 10 and a != b:\n"
+        "\t\treturn [x, a, b]\n"
+        "\treturn {{'a': a, 'b': b}}\n\n\n".format(i)
+        for i in range(size)
+    )
+
+
+def _generate_nested_literal(size):
+    rows = ",\n".join(
+        "\t[{}, {{'key_{}': [{}, {}]}}, 'some string']".format(i, i, i, i + 1)
+        for i in range(size)
+    )
+    return "var data = [\n{},\n]\n".format(rows)
+
+
+def _generate_nested_blocks(size):
+    depth = 8
+    nested_block = "".join(
+        "{0}if x > {1}:\n{0}\tx -= 1\n".format("\t" * (level + 1), level)
+        for level in range(depth)
+    )
+    return "".join(
+        "func foo_{}(x):\n{}\treturn x\n\n\n".format(i, nested_block)
+        for i in range(size)
+    )
+
+
+def _generate_deeply_nested_expressions(size):
+    return "".join(
+        "var x_{} = {}1{}\n".format(i, "[" * 30, "]" * 30) for i in range(size)
+    )
+
+
+GENERATORS = {
+    "functions": (_generate_functions, 200),
+    "nested-literal": (_generate_nested_literal, 500),
+    "nested-blocks": (_generate_nested_blocks, 75),
+    "deeply-nested-expressions": (_generate_deeply_nested_expressions, 75),
+}
+
+
+def _format(code, safety_checks):
+    formatted_code = format_code(code, MAX_LINE_LENGTH)
+    if safety_checks:
+        check_formatting_safety(code, formatted_code, MAX_LINE_LENGTH)
+
+
+def _measure_time(code, safety_checks):
+    timings = []
+    for _ in range(REPETITIONS):
+        # parser caches some internals on first use
+        parser.parse(code)
+        gc.collect()
+        begin = time.perf_counter()
+        _format(code, safety_checks)
+        timings.append(time.perf_counter() - begin)
+    return statistics.median(timings)
+
+
+def _measure_peak_memory(code, safety_checks):
+    tracemalloc.start()
+    try:
+        _format(code, safety_checks)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _report(name, code, safety_checks):
+    elapsed = _measure_time(code, safety_checks)
+    peak_memory = _measure_peak_memory(code, safety_checks)
+    lines_num = len(code.splitlines())
+    print(
+        "\n{} ({} lines, safety checks {}):".format(
+            name, lines_num, "on" if safety_checks else "off"
+        ),
+        "{:.0f} lines/s, peak memory {:.1f} MiB".format(
+            lines_num / elapsed, peak_memory / 2**20
+        ),
+    )
+    return elapsed
+
+
+def _real_world_scripts():
+    this_dir = os.path.dirname(os.path.abspath(__file__))
+    for data_dir in REAL_WORLD_DATA_DIRS:
+        data_dir_path = os.path.join(this_dir, data_dir)
+        for file_name in sorted(os.listdir(data_dir_path)):
+            yield os.path.join(data_dir_path, file_name)
+
+
+@pytest.mark.parametrize("safety_checks", [False, True])
+def test_real_world_scripts_throughput(safety_checks):
+    for file_path in _real_world_scripts():
+        with open(file_path, "r") as fh:
+            code = fh.read()
+        try:
+            format_code(code, MAX_LINE_LENGTH)
+        except Exception:  # pylint: disable=broad-except
+            continue  # some of valid scripts are not formattable yet
+        _report(os.path.basename(file_path), code, safety_checks)
+
+
+@pytest.mark.parametrize("safety_checks", [False, True])
+@pytest.mark.parametrize("generator_name", GENERATORS.keys())
+def test_formatting_time_scales_linearly(generator_name, safety_checks):
+    generator, base_size = GENERATORS[generator_name]
+    timings = [
+        _report(
+            "{} x{}".format(generator_name, size),
+            generator(size),
+            safety_checks,
+        )
+        for size in [base_size, base_size * 2, base_size * 4]
+    ]
+    # a single doubling step is too short to be measured reliably
+    assert timings[-1] <= timings[0] * MAX_QUADRUPLING_TIME_RATIO
+
+
+@pytest.mark.parametrize("size", [20000, 100000])
+def test_diff_of_repetitive_data_array(size):
+    # every other row of a long data array gets reformatted
+    a_lines = ["\t[1,2],", "\t[3, 4],"] * (size // 2)
+    b_lines = ["\t[1, 2],", "\t[3, 4],"] * (size // 2)
+    begin = time.perf_counter()
+    diff = list(unified_diff(a_lines, b_lines))
+    elapsed = time.perf_counter() - begin
+    difflib_begin = time.perf_counter()
+    list(difflib.unified_diff(a_lines, b_lines, lineterm=""))
+    difflib_elapsed = time.perf_counter() - difflib_begin
+    print(
+        "\ndiff of {} lines: {:.3f} s (difflib: {:.3f} s)".format(
+            size, elapsed, difflib_elapsed
+        )
+    )
+    assert len(diff) > 0
+    assert elapsed <= max(difflib_elapsed * 5, 0.1)
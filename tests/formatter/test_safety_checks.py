@@ -0,0 +1,80 @@
+import pytest
+
+from gdtoolkit.formatter import (
+    check_formatting_safety,
+    check_comment_persistence,
+    check_tree_invariant,
+)
+from gdtoolkit.formatter.exceptions import (
+    TreeInvariantViolation,
+    FormattingStabilityViolation,
+    CommentPersistenceViolation,
+)
+
+
+MAX_LINE_LENGTH = 100
+
+
+def test_unstable_statement_among_unchanged_ones_is_detected():
+    given_code = "var a = 1\nvar b=2\nvar c = 3\n"
+    formatted_code = "var a = 1\nvar b =  2\nvar c = 3\n"
+    with pytest.raises(FormattingStabilityViolation):
+        check_formatting_safety(given_code, formatted_code, MAX_LINE_LENGTH)
+
+
+def test_tree_change_among_unchanged_statements_is_detected():
+    given_code = "var a = 1\nvar b=2\nvar c = 3\n"
+    formatted_code = "var a = 1\nvar b = 3\nvar c = 3\n"
+    with pytest.raises(TreeInvariantViolation):
+        check_formatting_safety(given_code, formatted_code, MAX_LINE_LENGTH)
+
+
+def test_unstable_gap_after_unchanged_statement_is_detected():
+    given_code = "var a = 1\n\n\nfunc foo():\n\tpass\n"
+    formatted_code = "var a = 1\nfunc foo():\n\tpass\n"
+    with pytest.raises(FormattingStabilityViolation):
+        check_formatting_safety(given_code, formatted_code, MAX_LINE_LENGTH)
+
+
+def test_first_missing_comment_is_reported():
+    given_code = "var a = 1  # x\n# y\nvar b = 2  # z\n"
+    formatted_code = "var a = 1  # x\nvar b = 2\n"
+    with pytest.raises(CommentPersistenceViolation) as exception_info:
+        check_comment_persistence(given_code, formatted_code)
+    assert exception_info.value.missing_comment == "# y"
+
+
+def test_duplicated_comments_are_persistent():
+    given_code = "# x\nvar a = 1  # x\n"
+    formatted_code = "# x\nvar a = 1  # x\n"
+    check_comment_persistence(given_code, formatted_code)
+
+
+def test_merged_comments_are_persistent():
+    given_code = "var a = [  # x\n\t1  # y\n]\n"
+    formatted_code = "var a = [1]  # x  # y\n"
+    check_comment_persistence(given_code, formatted_code)
+
+
+def test_comments_merged_partially_are_not_persistent():
+    given_code = "var a = [  # x\n\t1  # y\n]\n"
+    formatted_code = "var a = [1]  # x # y z\n"
+    with pytest.raises(CommentPersistenceViolation) as exception_info:
+        check_comment_persistence(given_code, formatted_code)
+    assert exception_info.value.missing_comment == "# y"
+
+
+def test_tree_invariant_violation_diff_is_narrowed_to_differing_statement():
+    given_code = "func foo():\n\tvar a = 1\n\tvar b = 2\n\tvar c = 3\n"
+    formatted_code = "func foo():\n\tvar a = 1\n\tvar b = 4\n\tvar c = 3\n"
+    with pytest.raises(TreeInvariantViolation) as exception_info:
+        check_tree_invariant(given_code, formatted_code)
+    diff = exception_info.value.diff
+    changed_lines = [
+        line
+        for line in diff.splitlines()
+        if line.startswith(("-", "+")) and not line.startswith(("---", "+++"))
+    ]
+    assert changed_lines == ["-    expr\t2", "+    expr\t4"]
+    assert "func_def" not in diff
+    assert "a\n" not in diff and "c\n" not in diff
@@ -1,3 +1,4 @@
+import os
 import subprocess
 
 from ..common import write_file
@@ -48,3 +49,103 @@ def test_pretty_printing_unexpected_token(tmp_path):
     assert len(outcome.stdout.decode().splitlines()) == 0
     assert len(outcome.stderr.decode().splitlines()) > 0
     assert "Traceback" not in outcome.stderr.decode()
+
+
+def test_directories_with_gdignore_are_skipped(tmp_path):
+    os.mkdir(os.path.join(tmp_path, "addons"))
+    write_file(tmp_path, "addons/.gdignore", "")
+    write_file(tmp_path, "addons/script.gd", "var Xx = 1")
+    assert subprocess.run(["gdlint", tmp_path], check=False).returncode == 0
+
+
+def test_all_syntax_errors_are_reported_along_with_problems(tmp_path):
+    dummy_file = write_file(
+        tmp_path, "script.gd", "var x = 1 +\nvar Xx = 1\nvar y = 2 2\n"
+    )
+    outcome = subprocess.run(
+        ["gdlint", "--no-cache", dummy_file], check=False, capture_output=True
+    )
+    assert outcome.returncode != 0
+    stderr = outcome.stderr.decode()
+    assert "at line 1, column 12" in stderr
+    assert "at line 3, column 11" in stderr
+    assert "(class-variable-name)" in stderr
+    assert "Failure: 3 problems found" in stderr
+
+
+def test_scope_checks_are_skipped_for_scopes_with_syntax_errors(tmp_path):
+    dummy_file = write_file(
+        tmp_path, "script.gd", "func f(a):\n\tvar x = = a\nfunc g(b):\n\tpass\n"
+    )
+    outcome = subprocess.run(
+        ["gdlint", "--no-cache", dummy_file], check=False, capture_output=True
+    )
+    stderr = outcome.stderr.decode()
+    assert "unused function argument 'a'" not in stderr
+    assert "unused function argument 'b'" in stderr
+
+
+def test_engine_directories_of_projects_are_skipped(tmp_path):
+    write_file(tmp_path, "project.godot", "")
+    os.mkdir(os.path.join(tmp_path, ".godot"))
+    write_file(tmp_path, ".godot/script.gd", "var Xx = 1")
+    assert subprocess.run(["gdlint", tmp_path], check=False).returncode == 0
+
+
+def test_project_scripts_are_processed_first(tmp_path):
+    write_file(
+        tmp_path,
+        "project.godot",
+        '[application]\nrun/main_scene="res://main.tscn"\n'
+        '[autoload]\nGlobal="*res://z_global.gd"\n',
+    )
+    write_file(
+        tmp_path,
+        "main.tscn",
+        '[ext_resource path="res://y_main.gd" type="Script" id=1]\n',
+    )
+    for name in ["a.gd", "y_main.gd", "z_global.gd"]:
+        write_file(tmp_path, name, "var Xx = 1")
+    outcome = subprocess.run(
+        ["gdlint", "--project-scripts-first", tmp_path],
+        check=False,
+        capture_output=True,
+    )
+    reported_files = [
+        os.path.basename(line.split(":")[0])
+        for line in outcome.stderr.decode().splitlines()
+        if "Error" in line
+    ]
+    assert reported_files == ["z_global.gd", "y_main.gd", "a.gd"]
+
+
+def test_skipped_project_scripts_are_not_processed_first(tmp_path):
+    write_file(
+        tmp_path,
+        "project.godot",
+        '[autoload]\nGlobal="*res://addons/global.gd"\n'
+        'Generated="*res://generated/global.gd"\n'
+        'Excluded="*res://.git/global.gd"\n',
+    )
+    for directory in ["addons", "generated", ".git"]:
+        os.mkdir(os.path.join(tmp_path, directory))
+    write_file(tmp_path, "addons/.gdignore", "")
+    write_file(tmp_path, ".gitignore", "generated/\n")
+    for name in ["addons/global.gd", "generated/global.gd", ".git/global.gd"]:
+        write_file(tmp_path, name, "var Xx = 1")
+    assert (
+        subprocess.run(
+            ["gdlint", "--project-scripts-first", "--gitignore", tmp_path],
+            check=False,
+        ).returncode
+        == 0
+    )
+
+
+def test_files_ignored_by_gitignore_are_skipped(tmp_path):
+    write_file(tmp_path, ".gitignore", "generated_*.gd\n")
+    write_file(tmp_path, "generated_script.gd", "var Xx = 1")
+    assert subprocess.run(["gdlint", tmp_path], check=False).returncode != 0
+    assert (
+        subprocess.run(["gdlint", "--gitignore", tmp_path], check=False).returncode == 0
+    )
@@ -5,6 +5,7 @@ import shutil
 import pytest
 
 from gdtoolkit.parser import parser
+from gdtoolkit.parser.parser import MAX_ERROR_RECOVERY_PARSES
 
 
 OK_DATA_DIR = "../valid-gd-scripts"
@@ -70,3 +71,48 @@ def test_godot_check_only_potential_bugs(gdscript_bug_path):
     process = subprocess.Popen([GODOT_SERVER, "--check-only", "-s", gdscript_bug_path])
     process.wait()
     assert process.returncode != 0
+
+
+def test_parsing_with_error_recovery_failure(gdscript_nok_path):
+    with open(gdscript_nok_path, "r") as fh:
+        code = fh.read()
+        outcome = parser.parse_with_error_recovery(code, gather_metadata=True)
+        assert len(outcome.errors) > 0
+
+
+def test_parsing_with_error_recovery_reports_all_errors():
+    code = "\n".join(
+        [
+            "var a = 1 +",
+            "func f(x):",
+            "    var b = (x +",
+            "",
+            "    return x",
+            "func g(:",
+            "    pass",
+            "var c = 3 3",
+            "var d = 4",
+        ]
+    )
+    outcome = parser.parse_with_error_recovery(code, gather_metadata=True)
+    assert [error.line for error in outcome.errors] == [1, 5, 6, 8]
+    assert outcome.skipped_lines == {1, 3, 4, 5, 6, 7, 8}
+    # placeholders of the skipped statements are not in the tree
+    assert [statement.data for statement in outcome.tree.children] == [
+        "func_def",
+        "class_var_stmt",
+    ]
+
+
+def test_parsing_with_error_recovery_positions_errors_at_end_of_code():
+    code = "func f():\n\tvar x = foo(1\n"
+    outcome = parser.parse_with_error_recovery(code)
+    assert [(error.line, error.column) for error in outcome.errors] == [(2, 15)]
+    assert "line None" not in str(outcome.errors[0])
+
+
+def test_parsing_with_error_recovery_gives_up_eventually():
+    code = "var x = 1 +\n" * (MAX_ERROR_RECOVERY_PARSES + 1)
+    outcome = parser.parse_with_error_recovery(code)
+    assert outcome.tree is None
+    assert len(outcome.errors) == MAX_ERROR_RECOVERY_PARSES
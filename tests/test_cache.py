@@ -0,0 +1,64 @@
+import os
+
+from gdtoolkit.common.cache import ArtifactStore, BLOCK_SIZE_BYTES
+
+
+def test_artifacts_are_specific_to_kind_and_options(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.put("kind", "tool\n", [1, 2], options=80)
+    assert store.get("kind", "tool\n", options=80) == [1, 2]
+    assert ArtifactStore(str(tmp_path)).get("kind", "tool\n", options=80) == [1, 2]
+    assert store.get("kind", "tool\n", options=100) is None
+    assert store.get("other-kind", "tool\n", options=80) is None
+    assert store.get("kind", "extends Node\n", options=80) is None
+
+
+def test_least_recently_used_artifacts_are_evicted(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_size_bytes=2 * BLOCK_SIZE_BYTES)
+    for i, code in enumerate(["a", "b", "c"]):
+        store.put("kind", code, True)
+        os.utime(store._artifact_path("kind", code, None), (i, i))
+    assert store.get("kind", "a") is not None  # used most recently now
+    store.save()
+    assert store.get("kind", "a") is not None
+    assert store.get("kind", "b") is None
+    assert store.get("kind", "c") is not None
+
+
+def test_stats_and_clear(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.put("kind", "a", True)
+    store.put("kind", "b", True)
+    store.put("other-kind", "a", True)
+    stats = store.stats()
+    assert stats.entries == 3
+    assert stats.kinds["kind"][0] == 2
+    store.clear()
+    assert store.stats().entries == 0
+
+
+def test_unpicklable_artifacts_are_not_stored(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.put("kind", "a", lambda: None)
+    assert store.get("kind", "a") is None
+    assert store.stats().entries == 0
+    assert all(len(files) == 0 for _, _, files in os.walk(tmp_path))
+
+
+def test_store_is_walked_only_when_size_estimate_exceeds_cap(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), max_size_bytes=3 * BLOCK_SIZE_BYTES)
+    store.put("kind", "a", True)
+    store.save()
+    walks = []
+    list_artifacts = store._list_artifacts
+    monkeypatch.setattr(
+        store, "_list_artifacts", lambda: walks.append(1) or list_artifacts()
+    )
+    store.put("kind", "b", True)
+    store.save()
+    assert walks == []
+    store.put("kind", "c", True)
+    store.put("kind", "d", True)
+    store.save()
+    assert walks == [1]
+    assert store.stats().entries == 3
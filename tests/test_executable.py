@@ -0,0 +1,58 @@
+import os
+import subprocess
+
+from gdtoolkit.common.cache import SIZE_ESTIMATE_FILE_NAME
+
+from .common import write_file
+
+
+def test_check_of_valid_file(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "tool\n")
+    outcome = subprocess.run(
+        ["gdtoolkit", "check", dummy_file], check=False, capture_output=True
+    )
+    assert outcome.returncode == 0
+
+
+def test_check_reports_problems_of_all_tools(tmp_path):
+    write_file(tmp_path, "script.gd", "var Xx=1\n")
+    write_file(
+        tmp_path, "script2.gd", "func foo(x):\n\tif x:\n\t\tpass\n\telif x:\n\t\tpass\n"
+    )
+    write_file(tmp_path, "script3.gd", "var x = (\n")
+    outcome = subprocess.run(
+        ["gdtoolkit", "check", "--max-complexity=2", "--jobs=2", tmp_path],
+        check=False,
+        capture_output=True,
+    )
+    assert outcome.returncode == 1
+    stderr = outcome.stderr.decode()
+    assert "(class-variable-name)" in stderr
+    assert "(gdformat)" in stderr
+    assert "(max-complexity)" in stderr
+    assert "Unexpected token" in stderr
+    assert "Traceback" not in stderr
+
+
+def test_check_results_are_cached(tmp_path):
+    dummy_file = write_file(tmp_path, "script.gd", "tool\n")
+    environment = dict(os.environ, XDG_CACHE_HOME=str(tmp_path))
+    for _ in range(2):
+        outcome = subprocess.run(
+            ["gdtoolkit", "check", dummy_file],
+            check=False,
+            capture_output=True,
+            env=environment,
+        )
+        assert outcome.returncode == 0
+    outcome = subprocess.run(
+        ["gdtoolkit", "cache", "stats"],
+        check=True,
+        capture_output=True,
+        env=environment,
+    )
+    assert "check: 1 entries" in outcome.stdout.decode()
+    # the store size is tracked by the estimate instead of walking the store
+    assert os.path.isfile(
+        os.path.join(tmp_path, "gdtoolkit", "artifacts", SIZE_ESTIMATE_FILE_NAME)
+    )
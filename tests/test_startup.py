@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+# modules of entry points and how long (in microseconds) importing them may take
+ENTRY_POINTS = {
+    "gdtoolkit.__main__": 100000,
+    "gdtoolkit.formatter.__main__": 100000,
+    "gdtoolkit.linter.__main__": 100000,
+    "gdtoolkit.gd2py.__main__": 100000,
+    "gdtoolkit.gdradon.__main__": 100000,
+    # the parser itself is the only thing gdparse needs
+    "gdtoolkit.parser.__main__": 150000,
+}
+HEAVY_MODULES = ["lark", "yaml", "radon"]
+
+
+def _import_times(module):
+    # Returns cumulative import times (in microseconds) of all modules imported
+    outcome = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        check=True,
+        capture_output=True,
+    )
+    import_times = {}
+    for line in outcome.stderr.decode().splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+@pytest.mark.parametrize(
+    "module", [m for m in ENTRY_POINTS if m != "gdtoolkit.parser.__main__"]
+)
+def test_entry_point_does_not_import_heavy_modules(module):
+    import_times = _import_times(module)
+    assert module in import_times
+    assert [m for m in HEAVY_MODULES if m in import_times] == []
+
+
+@pytest.mark.skipif(
+    os.environ.get("GDTOOLKIT_BENCHMARKS") is None,
+    reason="set GDTOOLKIT_BENCHMARKS to run benchmarks",
+)
+@pytest.mark.parametrize("module", ENTRY_POINTS.keys())
+def test_entry_point_startup_time(module):
+    import_time = min(_import_times(module)[module] for _ in range(3))
+    print("\n{}: {:.1f} ms".format(module, import_time / 1000))
+    assert import_time <= ENTRY_POINTS[module]